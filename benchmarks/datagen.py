@@ -0,0 +1,125 @@
+# Synthetic tournament data in the database directory format.
+#
+#   python benchmarks/datagen.py --teams 500 --games 20 --matches 1000000 --out /tmp/esr-db
+
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+from collections import Counter
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from esr.storage import SEGMENT_DIR, SUMMARY_SUFFIX, CSVStore
+
+START_DATE = date(2015, 1, 1)
+DAYS = 3650
+
+
+def team_names(count):
+    return [f"Team {i}" for i in range(count)]
+
+
+def game_names(count):
+    return [f"Game {i}" for i in range(count)]
+
+
+def synthetic_matches(teams, games, matches, seed=0):
+    # (date, game, team1, team2, winner) rows in date order over ten years
+    rng = random.Random(seed)
+    team_list = team_names(teams)
+    game_list = game_names(games)
+    for i in range(matches):
+        team1, team2 = rng.sample(team_list, 2)
+        yield (
+            (START_DATE + timedelta(days=i * DAYS // max(matches, 1))).isoformat(),
+            rng.choice(game_list),
+            team1,
+            team2,
+            rng.choice((team1, team2))
+        )
+
+
+def generate(directory, teams, games, matches, seed=0, legacy=False, force=False):
+    # Write teams.csv, games.csv and the month segments with their
+    # summaries plus the game_scores.csv snapshot and checksums.csv, with
+    # scores consistent with the matches.  `legacy` writes a single
+    # matches.csv and no snapshots, like databases from before they existed.
+    # A directory that is not empty is only replaced with `force`.
+    if os.path.isdir(directory) and os.listdir(directory):
+        if not force:
+            raise FileExistsError(f"{directory} is not empty")
+        shutil.rmtree(directory)
+    os.makedirs(directory, exist_ok=True)
+
+    wins = Counter()
+    game_scores = {}
+    period_scores = {}
+    segments = {}
+
+    def writer_for(period):
+        if legacy:
+            period = None
+        if period not in segments:
+            if period is None:
+                path = os.path.join(directory, 'matches.csv')
+            else:
+                os.makedirs(os.path.join(directory, SEGMENT_DIR), exist_ok=True)
+                path = os.path.join(directory, SEGMENT_DIR, period + '.csv')
+            file = open(path, 'w', newline='')
+            segments[period] = (file, csv.writer(file))
+        return segments[period][1]
+
+    try:
+        for row in synthetic_matches(teams, games, matches, seed):
+            period = row[0][:7]
+            writer_for(period).writerow(row)
+            _, game, team1, team2, winner = row
+            wins[winner] += 1
+            for team in (team1, team2):
+                for scores in (game_scores, period_scores.setdefault(period, {})):
+                    entry = scores.setdefault((game, team), [0, 0])
+                    entry[0] += team == winner
+                    entry[1] += 1
+    finally:
+        for file, _ in segments.values():
+            file.close()
+
+    with open(os.path.join(directory, 'teams.csv'), 'w', newline='') as file:
+        csv.writer(file).writerows((team, wins[team]) for team in team_names(teams))
+    with open(os.path.join(directory, 'games.csv'), 'w', newline='') as file:
+        csv.writer(file).writerows([game] for game in game_names(games))
+    if not legacy:
+        with open(os.path.join(directory, 'game_scores.csv'), 'w', newline='') as file:
+            csv.writer(file).writerows((game, team, won, played)
+                                       for (game, team), (won, played) in game_scores.items())
+        for period, scores in period_scores.items():
+            with open(os.path.join(directory, SEGMENT_DIR, period + SUMMARY_SUFFIX), 'w', newline='') as file:
+                csv.writer(file).writerows((game, team, won, played)
+                                           for (game, team), (won, played) in scores.items())
+        CSVStore(directory).write_checksums()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic E-Sports Results Tracker database.")
+    parser.add_argument('--teams', type=int, default=100)
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--matches', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--legacy', action='store_true', help="one matches.csv and no score snapshots, like old databases")
+    parser.add_argument('--out', required=True, help="directory to create, e.g. /tmp/esr-db")
+    parser.add_argument('--force', action='store_true', help="replace --out if it is not empty")
+    args = parser.parse_args()
+
+    try:
+        generate(args.out, args.teams, args.games, args.matches, args.seed, args.legacy, args.force)
+    except FileExistsError as error:
+        sys.exit(f"{error}; use --force to replace it.")
+    print(f"Wrote {args.matches} matches, {args.teams} teams, {args.games} games to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
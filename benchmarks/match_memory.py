@@ -0,0 +1,79 @@
+# Memory used by the match log at scale: the original list of dicts versus
+# the columnar MatchColumns store.  Both are filled from the same CSV file
+# through csv.reader, the way load_data reads matches.csv.
+#
+#   python benchmarks/match_memory.py --matches 1000000
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.datagen import synthetic_matches
+from esr.columnar import MatchColumns
+
+
+def write_matches(path, matches, teams, games, seed=0):
+    with open(path, 'w', newline='') as file:
+        csv.writer(file).writerows(synthetic_matches(teams, games, matches, seed))
+
+
+def load_dicts(path):
+    matches = []
+    with open(path, 'r', newline='') as file:
+        for row in csv.reader(file):
+            matches.append({
+                'date': row[0],
+                'game': row[1],
+                'team1': row[2],
+                'team2': row[3],
+                'winner': row[4]
+            })
+    return matches
+
+
+def load_columns(path):
+    columns = MatchColumns()
+    with open(path, 'r', newline='') as file:
+        for row in csv.reader(file):
+            columns.append(*row)
+    return columns
+
+
+def measure(loader, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = loader(path)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare match log memory: list of dicts vs columns.")
+    parser.add_argument('--matches', type=int, default=1_000_000)
+    parser.add_argument('--teams', type=int, default=500)
+    parser.add_argument('--games', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'matches.csv')
+        write_matches(path, args.matches, args.teams, args.games)
+
+        print(f"{args.matches:,} matches, {args.teams} teams, {args.games} games")
+        print(f"{'layout':<16}{'retained MiB':>14}{'peak MiB':>12}{'bytes/match':>14}{'load s':>10}")
+        for name, loader in (('list of dicts', load_dicts), ('MatchColumns', load_columns)):
+            current, peak, elapsed = measure(loader, path)
+            print(f"{name:<16}{current / 2**20:>14.1f}{peak / 2**20:>12.1f}"
+                  f"{current / max(args.matches, 1):>14.1f}{elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
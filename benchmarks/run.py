@@ -0,0 +1,205 @@
+# Benchmark suite: load, save, record and every scoreboard query against
+# synthetic databases, written out as JSON for comparing versions.
+#
+#   python benchmarks/run.py --matches 10000 100000 1000000 --output bench.json
+#
+# Everything runs on the headless core.  --gui additionally times the Tk
+# views with the main window withdrawn; it is skipped without a display.
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.datagen import DAYS, START_DATE, game_names, generate, team_names
+from esr.repository import BACKENDS, open_repository
+from esr.tracker import Tracker
+
+
+def timed(function, repeat):
+    # Wall-clock seconds of `repeat` calls; the last result is returned too
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - started)
+    return samples, result
+
+
+def summary(samples):
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'max': max(samples),
+        'runs': len(samples)
+    }
+
+
+def opened(backend, directory, history=True):
+    repository = open_repository(backend, directory)
+    repository.load()
+    if history:
+        repository.load_history()
+    return repository
+
+
+def bench_dataset(backend, directory, args, size):
+    results = {}
+
+    def record(name, samples, rows=None):
+        results[name] = summary(samples)
+        if rows is not None:
+            results[name]['rows'] = rows
+
+    if backend == 'sqlite':
+        # The first SQLite open migrates the CSV files
+        samples, repository = timed(lambda: opened('sqlite', directory), 1)
+        record('migrate', samples)
+        repository.close()
+
+    def load():
+        repository = opened(backend, directory, history=False)
+        repository.close()
+
+    record('load', timed(load, args.repeat)[0])
+
+    def load_history():
+        repository = opened(backend, directory)
+        repository.close()
+
+    record('load_history', timed(load_history, args.repeat)[0])
+
+    repository = opened(backend, directory)
+    tracker = Tracker(repository)
+    teams = team_names(args.teams)
+    games = game_names(args.games)
+    middle = START_DATE + timedelta(days=DAYS // 2)
+
+    samples, rows = timed(repository.overall_scoreboard, args.repeat)
+    record('overall_scoreboard', samples, len(rows))
+    samples, rows = timed(lambda: repository.game_scoreboard(games[0]), args.repeat)
+    record('game_scoreboard', samples, len(rows))
+    samples, rows = timed(repository.scored_games, args.repeat)
+    record('scored_games', samples, len(rows))
+    samples, rows = timed(lambda: repository.last_matches(5), args.repeat)
+    record('last_5_matches', samples, len(rows))
+    samples, rows = timed(lambda: repository.matches_between(middle.isoformat(),
+                                                             (middle + timedelta(days=30)).isoformat()),
+                          args.repeat)
+    record('matches_between_30_days', samples, len(rows))
+    samples, rows = timed(lambda: repository.matches(size // 2, size // 2 + 50), args.repeat)
+    record('matches_page_50', samples, len(rows))
+
+    # Each recorded match is made durable before the next one
+    day = (START_DATE + timedelta(days=DAYS)).isoformat()
+    samples, _ = timed(lambda: tracker.record_match(day, games[0], teams[0], teams[1], teams[0]),
+                       args.records)
+    record('record_match', samples)
+
+    record('save', timed(repository.save, args.repeat)[0])
+
+    if args.gui:
+        results.update(bench_gui(backend, directory, args.repeat))
+
+    repository.close()
+    return results
+
+
+def bench_gui(backend, directory, repeat):
+    # Time the Tk views with the window withdrawn; needs a display
+    try:
+        from esr_tracker import ESRTracker
+        app = ESRTracker(backend, directory)
+    except Exception as error:
+        return {'gui_skipped': str(error)}
+
+    app.root.withdraw()
+    app.repo.load_history()
+    results = {}
+    views = {
+        'gui_view_matches': app.view_matches,
+        'gui_display_last_matches': app.display_last_matches,
+        'gui_overall_scoreboard': app.overall_scoreboard,
+        'gui_game_specific_scoreboard': app.game_specific_scoreboard,
+    }
+    for name, view in views.items():
+        def render():
+            view()
+            app.root.update()
+        results[name] = summary(timed(render, repeat)[0])
+
+    app.persistence.stop()
+    app.root.destroy()
+    return results
+
+
+def version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the E-Sports Results Tracker.")
+    parser.add_argument('--matches', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--teams', type=int, default=200)
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--backend', choices=BACKENDS, nargs='+', default=list(BACKENDS))
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement")
+    parser.add_argument('--records', type=int, default=20, help="matches recorded for record_match")
+    parser.add_argument('--gui', action='store_true', help="also time the Tk views (needs a display)")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        'version': version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': date.today().isoformat(),
+        'teams': args.teams,
+        'games': args.games,
+        'runs': []
+    }
+
+    workspace = tempfile.mkdtemp(prefix='esr-bench-')
+    try:
+        for size in args.matches:
+            for backend in args.backend:
+                directory = os.path.join(workspace, f'{backend}-{size}')
+                started = time.perf_counter()
+                generate(directory, args.teams, args.games, size)
+                print(f"{backend:>6} {size:>9} matches: generated in {time.perf_counter() - started:.1f}s",
+                      file=sys.stderr)
+
+                results = bench_dataset(backend, directory, args, size)
+                report['runs'].append({'backend': backend, 'matches': size, 'results': results})
+                for name, result in results.items():
+                    if isinstance(result, dict):
+                        print(f"{backend:>6} {size:>9} {name:<28} {result['median'] * 1000:>10.3f} ms",
+                              file=sys.stderr)
+                shutil.rmtree(directory)
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+# Core (non-GUI) modules of the E-Sports Results Tracker.
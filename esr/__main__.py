@@ -0,0 +1,219 @@
+# Command line interface: python -m esr <command> ...
+#
+# Only the storage layer is imported (never tkinter), so commands start
+# quickly and run without a display.
+
+import argparse
+import os
+import sys
+
+from esr.indexes import period_range
+from esr.ratings import ELO_K
+from esr.repository import BACKENDS
+from esr.storage import DATA_DIR
+from esr.tracker import Tracker, ValidationError
+
+
+def print_table(headings, rows):
+    rows = [[str(value) for value in row] for row in rows]
+    widths = [max([len(heading)] + [len(row[i]) for row in rows]) for i, heading in enumerate(headings)]
+    print('  '.join(heading.ljust(width) for heading, width in zip(headings, widths)).rstrip())
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+
+
+def scoreboard(tracker, args):
+    repository = tracker.repository
+    if args.period:
+        try:
+            period_range(args.period)
+        except ValueError as error:
+            sys.exit(str(error))
+        rows = repository.period_scoreboard(args.period, args.game)
+        if not rows:
+            print(f"No matches recorded in {args.period}{' for ' + args.game if args.game else ''}.")
+            return
+        print_table(('Team', 'Wins', 'Played'), rows[:args.top])
+    elif args.game:
+        rows = repository.game_scoreboard(args.game)
+        if not rows:
+            print(f"No matches recorded for {args.game} yet.")
+            return
+        print_table(('Team', 'Wins', 'Played'), rows[:args.top])
+    else:
+        print_table(('Team', 'Points', 'Wins', 'Played'), repository.standings()[:args.top])
+
+
+def ratings(tracker, args):
+    repository = tracker.repository
+    system = 'glicko2' if args.glicko else 'elo'
+    repository.configure_ratings(args.k, glicko=args.glicko)
+    rows = repository.rating_leaderboard(args.game, system)
+    if not rows:
+        print("No rated matches yet.")
+        return
+    third = 'RD' if args.glicko else 'Played'
+    print_table(('Team', 'Rating', third),
+                ((team, round(rating), round(value) if args.glicko else value)
+                 for team, rating, value in rows[:args.top]))
+
+
+def history(tracker, args):
+    repository = tracker.repository
+    if not repository.has_team(args.team):
+        sys.exit(f"Unknown team '{args.team}'.")
+
+    if args.against:
+        if not repository.has_team(args.against):
+            sys.exit(f"Unknown team '{args.against}'.")
+        wins1, wins2, played = repository.head_to_head(args.team, args.against)
+        print(f"{args.team} {wins1} - {wins2} {args.against} ({played} matches)")
+        matches = repository.pair_matches(args.team, args.against)
+    else:
+        current, longest = repository.win_streaks(args.team)
+        matches = repository.team_matches(args.team)
+        print(f"{len(matches)} matches; current win streak {current}, longest {longest}")
+
+    matches = matches[::-1][:args.count]
+    print_table(('Date', 'Game', 'Team 1', 'Team 2', 'Winner'),
+                ([match['date'], match['game'], match['team1'], match['team2'], match['winner']]
+                 for match in matches))
+
+
+def last(tracker, args):
+    matches = tracker.repository.last_matches(args.count)
+    if not matches:
+        print("No matches recorded yet.")
+        return
+    print_table(('Date', 'Game', 'Team 1', 'Team 2', 'Winner'),
+                ([match['date'], match['game'], match['team1'], match['team2'], match['winner']]
+                 for match in matches))
+
+
+def record(tracker, args):
+    match = tracker.record_match(args.date, args.game, args.team1, args.team2, args.winner)
+    print(f"Recorded {match[0]} {match[1]}: {match[2]} vs {match[3]}, winner {match[4]}")
+
+
+def import_files(tracker, args):
+    from esr.importer import import_matches, write_rejects
+
+    # One flush per batch instead of one per match
+    tracker.repository.autoflush = False
+    reports = []
+    for path in args.files:
+        report = import_matches(tracker.repository, path, args.batch_size)
+        reports.append(report)
+        print(report.summary())
+        for line, values, reason in report.rejected[:20]:
+            print(f"  line {line}: {reason}", file=sys.stderr)
+        if len(report.rejected) > 20:
+            print(f"  ... {len(report.rejected) - 20} more", file=sys.stderr)
+
+    if args.rejects:
+        write_rejects(reports, args.rejects)
+
+
+def merge(tracker, args):
+    from esr.importer import merge_files, write_rejects
+
+    def progress(stage, done, total):
+        noun = 'files parsed' if stage == 'parse' else 'matches merged'
+        print(f"\r{done} of {total} {noun}".ljust(40), end='' if done < total else '\n', file=sys.stderr, flush=True)
+
+    # Scores and indexes are updated as the matches go in; one flush at the end
+    tracker.repository.autoflush = False
+    report = merge_files(tracker.repository, args.files, args.workers, progress)
+    print(report.summary())
+    print(report.throughput())
+    for file_report in report.reports():
+        for line, values, reason in file_report.rejected[:20]:
+            print(f"  {os.path.basename(file_report.path)} line {line}: {reason}", file=sys.stderr)
+        if len(file_report.rejected) > 20:
+            print(f"  ... {len(file_report.rejected) - 20} more in {file_report.path}", file=sys.stderr)
+
+    if args.rejects:
+        write_rejects(report.reports(), args.rejects)
+
+
+def migrate(args):
+    from esr.sqlite_repository import DATABASE_FILE, SQLiteRepository
+
+    path = os.path.join(args.data_dir, DATABASE_FILE)
+    if os.path.exists(path):
+        sys.exit(f"{path} already exists.")
+
+    # Opening a new SQLite database copies the CSV data into it
+    repository = SQLiteRepository(args.data_dir)
+    repository.load()
+    print(f"Migrated {repository.match_count()} matches into {repository.path}")
+    repository.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m esr', description="E-Sports Results Tracker")
+    parser.add_argument('--backend', choices=BACKENDS, default='csv', help="storage backend (default: csv)")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="database directory (default: database)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('scoreboard', help="overall or game-specific scoreboard")
+    command.add_argument('--game', help="show the scoreboard of this game")
+    command.add_argument('--period', metavar='YYYY[-MM]', help="only the matches of this year or month")
+    command.add_argument('--top', type=int, help="only the first TOP teams")
+    command.set_defaults(run=scoreboard)
+
+    command = commands.add_parser('ratings', help="Elo (or Glicko-2) rating leaderboard")
+    command.add_argument('--game', help="ratings from this game's matches only (Elo)")
+    command.add_argument('--top', type=int, help="only the first TOP teams")
+    command.add_argument('--k', type=float, default=ELO_K, help=f"Elo K-factor (default: {ELO_K:g})")
+    command.add_argument('--glicko', action='store_true', help="show overall Glicko-2 ratings instead")
+    command.set_defaults(run=ratings)
+
+    command = commands.add_parser('history', help="a team's matches, or its head-to-head record against another")
+    command.add_argument('team')
+    command.add_argument('--against', metavar='TEAM', help="only matches against this team")
+    command.add_argument('-n', '--count', type=int, help="only the COUNT most recent matches")
+    command.set_defaults(run=history)
+
+    command = commands.add_parser('last', help="the most recent matches")
+    command.add_argument('-n', '--count', type=int, default=5, help="number of matches (default: 5)")
+    command.set_defaults(run=last)
+
+    command = commands.add_parser('record', help="record a match result")
+    command.add_argument('date', help="YYYY-MM-DD")
+    command.add_argument('game')
+    command.add_argument('team1')
+    command.add_argument('team2')
+    command.add_argument('winner')
+    command.set_defaults(run=record)
+
+    command = commands.add_parser('import', help="import match results from CSV/JSON files")
+    command.add_argument('files', nargs='+')
+    command.add_argument('--batch-size', type=int, default=1000)
+    command.add_argument('--rejects', help="write rejected rows with their reasons to this CSV file")
+    command.set_defaults(run=import_files)
+
+    command = commands.add_parser('merge', help="merge many match files at once, in parallel, skipping duplicates")
+    command.add_argument('files', nargs='+')
+    command.add_argument('--workers', type=int, help="processes reading the files (default: one per CPU)")
+    command.add_argument('--rejects', help="write rejected rows with their reasons to this CSV file")
+    command.set_defaults(run=merge)
+
+    command = commands.add_parser('migrate', help="copy the CSV database into a new SQLite database")
+    command.set_defaults(run=None)
+
+    args = parser.parse_args(argv)
+    if args.command == 'migrate':
+        return migrate(args)
+
+    tracker = Tracker.open(args.backend, args.data_dir)
+    try:
+        args.run(tracker, args)
+    except ValidationError as error:
+        sys.exit(str(error))
+    finally:
+        tracker.close()
+
+
+if __name__ == '__main__':
+    main()
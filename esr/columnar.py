@@ -0,0 +1,114 @@
+from array import array
+from datetime import date
+
+from esr.indexes import parse_date
+
+
+class NameTable:
+    """Interns names to small integer ids (and back)."""
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names.append(name)
+            self.ids[name] = name_id
+        return name_id
+
+    def get(self, name):
+        # Id of a name, or None if it was never interned
+        return self.ids.get(name)
+
+
+class MatchColumns:
+    """The match log as parallel integer arrays, one entry per row.
+
+    ``day`` holds the date ordinal, the other columns ids from the team and
+    game name tables, so a row costs 20 bytes instead of a dict of five
+    strings.  Dates that do not parse (hand-edited files) are stored as 0
+    with the original text kept in ``odd_dates``.
+    """
+
+    def __init__(self):
+        self.teams = NameTable()
+        self.games = NameTable()
+        self.day = array('i')
+        self.game = array('i')
+        self.team1 = array('i')
+        self.team2 = array('i')
+        self.winner = array('i')
+        self.odd_dates = {}
+        self.ordinals = {}  # date text -> ordinal, dates repeat a lot
+
+    def __len__(self):
+        return len(self.day)
+
+    def append(self, match_date, game, team1, team2, winner):
+        row = len(self.day)
+        day = self.ordinals.get(match_date)
+        if day is None:
+            try:
+                day = parse_date(match_date).toordinal()
+            except ValueError:
+                day = 0
+            self.ordinals[match_date] = day
+        if not day:
+            self.odd_dates[row] = match_date
+        self.day.append(day)
+        intern = self.teams.intern
+        self.game.append(self.games.intern(game))
+        self.team1.append(intern(team1))
+        self.team2.append(intern(team2))
+        self.winner.append(intern(winner))
+        return row
+
+    def copy(self):
+        # Snapshot for writing a checkpoint while new rows keep arriving
+        other = MatchColumns()
+        other.teams.names = list(self.teams.names)
+        other.games.names = list(self.games.names)
+        for column in ('day', 'game', 'team1', 'team2', 'winner'):
+            setattr(other, column, array('i', getattr(self, column)))
+        other.odd_dates = dict(self.odd_dates)
+        return other
+
+    def date_text(self, row):
+        day = self.day[row]
+        if day == 0:
+            return self.odd_dates[row]
+        return date.fromordinal(day).isoformat()
+
+    def values(self, row):
+        # (date, game, team1, team2, winner) as strings
+        names = self.teams.names
+        return (
+            self.date_text(row),
+            self.games.names[self.game[row]],
+            names[self.team1[row]],
+            names[self.team2[row]],
+            names[self.winner[row]]
+        )
+
+    def match(self, row):
+        match_date, game, team1, team2, winner = self.values(row)
+        return {
+            'date': match_date,
+            'game': game,
+            'team1': team1,
+            'team2': team2,
+            'winner': winner
+        }
+
+    def matches(self, rows):
+        return [self.match(row) for row in rows]
+
+    def iter_values(self):
+        for row in range(len(self.day)):
+            yield self.values(row)
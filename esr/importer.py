@@ -0,0 +1,306 @@
+import csv
+import hashlib
+import heapq
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from esr.tracker import FIELDS, Validator
+
+BATCH_SIZE = 1000
+
+# Characters read at a time from a JSON array file
+JSON_CHUNK_SIZE = 1 << 16
+
+# Matches handed to the repository at a time by merge_files, between
+# progress reports
+MERGE_BATCH_SIZE = 10000
+
+
+class ImportReport:
+    def __init__(self, path):
+        self.path = path
+        self.read = 0
+        self.imported = 0
+        self.rejected = []  # (line, values, reason)
+
+    def summary(self):
+        return (f"{self.imported} of {self.read} matches imported from {os.path.basename(self.path)}, "
+                f"{len(self.rejected)} rejected")
+
+
+def read_results(path):
+    # Yield (line, values) from a CSV file (optionally with a header row),
+    # a JSON array of objects or a JSON Lines file
+    if path.lower().endswith(('.jsonl', '.ndjson')):
+        with open(path, 'r', encoding='utf-8') as file:
+            for line, text in enumerate(file, 1):
+                if text.strip():
+                    yield line, json_values(text)
+    elif path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as file:
+            for line, item in enumerate(iter_json_array(file), 1):
+                yield line, json_values(item)
+    else:
+        with open(path, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            for row in reader:
+                if reader.line_num == 1 and [field.strip().lower() for field in row] == list(FIELDS):
+                    continue
+                yield reader.line_num, row
+
+
+def iter_json_array(file, chunk_size=JSON_CHUNK_SIZE):
+    # Items of the top-level JSON array in `file`, decoded one at a time
+    # from a buffer of a chunk or two instead of loading the whole file
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def next_char():
+        # The next character that is not whitespace, '' at the end
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                return buffer[position:position + 1]
+            fill()
+
+    if next_char() != '[':
+        raise ValueError("expected a JSON array of match objects")
+    position += 1
+    if next_char() == ']':
+        return
+    count = 0
+    while True:
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            end = None
+        # An item running up to the end of the buffer may go on in the
+        # next chunk, and so may a number ending a character or two before
+        # it: "2." decodes as 2, "1e-" as 1
+        short = end is not None and (end == len(buffer) or
+                                     isinstance(item, (int, float)) and len(buffer) - end < 3)
+        if end is None or short and not eof:
+            if eof:
+                raise ValueError(f"invalid JSON in array item {count + 1}")
+            fill()
+            continue
+        position = end
+        count += 1
+        yield item
+
+        separator = next_char()
+        position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError("expected ',' or ']' between JSON array items")
+        next_char()
+
+
+def json_values(item):
+    if isinstance(item, str):
+        try:
+            item = json.loads(item)
+        except ValueError:
+            return None
+    if not isinstance(item, dict):
+        return None
+    return [str(item.get(field, '')) for field in FIELDS]
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_import(repository, path, batch_size=BATCH_SIZE, flush=None):
+    # Import `path` one batch at a time, yielding the report after each
+    # batch so a caller can show progress or yield to an event loop.  Each
+    # batch is added in one call and persisted with one flush (by default
+    # repository.flush; the GUI passes its persistence worker instead).
+    report = ImportReport(path)
+    validator = Validator(repository)
+    flush = flush or repository.flush
+
+    for batch in batches(read_results(path), batch_size):
+        valid, rejected = validator.validate(batch)
+        if valid:
+            repository.add_matches(valid)
+            flush()
+        report.read += len(batch)
+        report.imported += len(valid)
+        report.rejected.extend(rejected)
+        yield report
+
+
+def import_matches(repository, path, batch_size=BATCH_SIZE):
+    report = ImportReport(path)
+    for report in iter_import(repository, path, batch_size):
+        pass
+    return report
+
+
+def write_rejects(reports, path):
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['file', 'line', 'reason', *FIELDS])
+        for report in reports:
+            for line, values, reason in report.rejected:
+                writer.writerow([report.path, line, reason, *(values or [])])
+
+
+# Merging many files at once: parsed and validated in parallel, one
+# process per file, then merged by date into the repository
+
+
+class KnownNames:
+    # Stands in for the repository in a worker process's Validator
+    def __init__(self, teams, games):
+        self.teams = teams
+        self.games = games
+
+    def has_team(self, name):
+        return name in self.teams
+
+    def has_game(self, title):
+        return title in self.games
+
+
+def match_digest(match):
+    # Content hash of a normalised (date, game, team1, team2, winner)
+    return hashlib.blake2b('\x1f'.join(match).encode('utf-8'), digest_size=16).digest()
+
+
+def parse_file(path, teams, games):
+    # Worker: the file's report and its valid matches as (match, digest),
+    # sorted by date (stable, so a file's own order is kept within a day)
+    report = ImportReport(path)
+    validator = Validator(KnownNames(teams, games))
+    rows = []
+    for line, values in read_results(path):
+        report.read += 1
+        match, reason = validator.check(values)
+        if reason is None:
+            rows.append((match, match_digest(match)))
+        else:
+            report.rejected.append((line, values, reason))
+    rows.sort(key=lambda row: row[0][0])
+    return report, rows
+
+
+class MergeReport:
+    def __init__(self, paths):
+        self.files = {path: None for path in paths}  # path -> ImportReport
+        self.read = 0
+        self.valid = 0
+        self.duplicates = 0
+        self.imported = 0
+        self.parse_seconds = 0.0
+        self.store_seconds = 0.0
+
+    def reports(self):
+        return [report for report in self.files.values() if report is not None]
+
+    def summary(self):
+        rejected = sum(len(report.rejected) for report in self.reports())
+        files = f"{len(self.files)} file{'s' if len(self.files) != 1 else ''}"
+        return (f"{self.imported} of {self.read} matches merged from {files}, "
+                f"{self.duplicates} duplicates skipped, {rejected} rejected")
+
+    def throughput(self):
+        parse_rate = self.read / self.parse_seconds if self.parse_seconds else 0
+        store_rate = self.imported / self.store_seconds if self.store_seconds else 0
+        return (f"parsed {self.read} rows in {self.parse_seconds:.2f} s ({parse_rate:,.0f} rows/s), "
+                f"stored {self.imported} in {self.store_seconds:.2f} s ({store_rate:,.0f} rows/s)")
+
+
+def merge_files(repository, paths, workers=None, progress=None, batch_size=MERGE_BATCH_SIZE):
+    # Merge match files into the repository.  Files are read and validated
+    # against the teams and games as they are now, in parallel across
+    # `workers` processes (one file per task; 1 reads them here).  A match
+    # is kept as many times as it appears in any one file: the same result
+    # sent by several scorers, or already in the repository, is stored
+    # once.  The rest goes in by date with a single flush at the end.
+    #
+    # progress(stage, done, total) is called as files are parsed
+    # ('parse', files) and as matches are stored ('store', matches).
+    report = MergeReport(paths)
+    teams = frozenset(team for team, _ in repository.teams())
+    games = frozenset(repository.games())
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+
+    # Results are kept in the order of `paths`, so that matches on the
+    # same day go in in the same order however the workers finish
+    start = time.perf_counter()
+    results = [None] * len(paths)
+    if workers <= 1 or len(paths) <= 1:
+        for i, path in enumerate(paths):
+            results[i] = parse_file(path, teams, games)
+            if progress is not None:
+                progress('parse', i + 1, len(paths))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(parse_file, path, teams, games): i for i, path in enumerate(paths)}
+            for done, future in enumerate(as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                if progress is not None:
+                    progress('parse', done, len(paths))
+    report.parse_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    wanted = Counter()  # digest -> copies in the file with the most
+    for file_report, rows in results:
+        report.files[file_report.path] = file_report
+        report.read += file_report.read
+        report.valid += len(rows)
+        for digest, copies in Counter(digest for _, digest in rows).items():
+            wanted[digest] = max(wanted[digest], copies)
+
+    # Copies already stored only need looking for over the dates merged
+    days = [rows[i][0][0] for _, rows in results if rows for i in (0, -1)]
+    if days:
+        wanted.subtract(Counter(match_digest(tuple(match[field] for field in FIELDS))
+                                for match in repository.matches_between(min(days), max(days))))
+
+    merged = heapq.merge(*(rows for _, rows in results), key=lambda row: row[0][0])
+    batch = []
+    for match, digest in merged:
+        if wanted[digest] <= 0:
+            report.duplicates += 1
+            continue
+        wanted[digest] -= 1
+        batch.append(match)
+        if len(batch) == batch_size:
+            repository.add_matches(batch)
+            report.imported += len(batch)
+            batch = []
+            if progress is not None:
+                progress('store', report.imported + report.duplicates, report.valid)
+    if batch:
+        repository.add_matches(batch)
+        report.imported += len(batch)
+    repository.flush()
+    if progress is not None:
+        progress('store', report.valid, report.valid)
+    report.store_seconds = time.perf_counter() - start
+    return report
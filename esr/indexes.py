@@ -0,0 +1,440 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# Partition of the matches whose date does not parse
+UNDATED = 'undated'
+
+
+def parse_date(text):
+    # Raises ValueError for anything that is not a YYYY-MM-DD date
+    text = text.strip()
+    if len(text) == 10 and text[4] == '-' and text[7] == '-':
+        # Fast path for the zero-padded form that is stored on disk
+        return date.fromisoformat(text)
+    return datetime.strptime(text, DATE_FORMAT).date()
+
+
+@lru_cache(maxsize=None)
+def period_of(day):
+    # The 'YYYY-MM' partition of a date ordinal (0: no valid date)
+    if not day:
+        return UNDATED
+    day = date.fromordinal(day)
+    return f'{day.year:04d}-{day.month:02d}'
+
+
+def date_ordinal(text):
+    # Ordinal of a match date, 0 if it does not parse (as in MatchColumns)
+    try:
+        return parse_date(text).toordinal()
+    except ValueError:
+        return 0
+
+
+def period_range(period):
+    # First and last date of a 'YYYY' or 'YYYY-MM' period; raises
+    # ValueError for anything else
+    year, _, month = period.partition('-')
+    if len(year) != 4 or month and len(month) != 2:
+        raise ValueError(f"Invalid period '{period}' (expected YYYY or YYYY-MM)")
+    if month:
+        first = date(int(year), int(month), 1)
+        last = (first + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    else:
+        first, last = date(int(year), 1, 1), date(int(year), 12, 31)
+    return first, last
+
+
+def in_period(key, period):
+    # True if the month `key` lies in `period` (a year or a month)
+    return key == period or key.startswith(period + '-')
+
+
+class GameScoreIndex:
+    """Per-game wins and appearances of every team, updated incrementally.
+
+    ``totals`` holds the same summed over all games.
+    """
+
+    def __init__(self):
+        self.scores = {}  # game -> {team: [wins, appearances]}
+        self.team_games = {}  # team -> set of games the team appears in
+        self.totals = {}  # team -> [wins, appearances]
+
+    def clear(self):
+        self.scores.clear()
+        self.team_games.clear()
+        self.totals.clear()
+
+    def add(self, game, team, won):
+        entry = self.scores.setdefault(game, {}).setdefault(team, [0, 0])
+        total = self.totals.setdefault(team, [0, 0])
+        if won:
+            entry[0] += 1
+            total[0] += 1
+        entry[1] += 1
+        total[1] += 1
+        self.team_games.setdefault(team, set()).add(game)
+
+    def discard(self, game, team, won):
+        # Undo add() for a deleted match
+        table = self.scores.get(game)
+        entry = table.get(team) if table else None
+        if entry is None:
+            return
+        self.adjust_total(team, -entry[0], -entry[1])
+        if won:
+            entry[0] = max(entry[0] - 1, 0)
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del table[team]
+            if not table:
+                del self.scores[game]
+            games = self.team_games[team]
+            games.discard(game)
+            if not games:
+                del self.team_games[team]
+        else:
+            self.adjust_total(team, entry[0], entry[1])
+
+    def adjust_total(self, team, wins, played):
+        total = self.totals.setdefault(team, [0, 0])
+        total[0] += wins
+        total[1] += played
+        if total[1] <= 0:
+            del self.totals[team]
+
+    def rows(self):
+        # (game, team, wins, appearances) for snapshotting the index
+        for game, table in self.scores.items():
+            for team, (wins, played) in table.items():
+                yield game, team, wins, played
+
+    def load_rows(self, rows):
+        for game, team, wins, played in rows:
+            self.scores.setdefault(game, {})[team] = [wins, played]
+            self.team_games.setdefault(team, set()).add(game)
+            self.adjust_total(team, wins, played)
+
+    def remove_team(self, team):
+        self.totals.pop(team, None)
+        for game in self.team_games.pop(team, ()):
+            table = self.scores[game]
+            del table[team]
+            if not table:
+                del self.scores[game]
+
+    def remove_game(self, game):
+        for team, (wins, played) in self.scores.pop(game, {}).items():
+            self.adjust_total(team, -wins, -played)
+            games = self.team_games[team]
+            games.discard(game)
+            if not games:
+                del self.team_games[team]
+
+    def games(self):
+        return sorted(self.scores)
+
+    def scoreboard(self, game):
+        # (team, wins, appearances) sorted by wins in descending order
+        table = self.scores.get(game, {})
+        rows = [(team, wins, played) for team, (wins, played) in table.items()]
+        rows.sort(key=lambda x: x[1], reverse=True)
+        return rows
+
+
+class PeriodScoreIndex:
+    """A GameScoreIndex per month, the summaries of the match segments.
+
+    Scoreboards of a month or a year add up these summaries instead of
+    reading the matches of that period.  A month's summary is only read
+    (through ``read``) when it is first needed; until then the adds and
+    discards for it are queued, together with the teams and games removed
+    since, and replayed on top of the summary when it is read.
+    """
+
+    def __init__(self):
+        self.periods = {}  # 'YYYY-MM' -> GameScoreIndex
+        self.unread = {}  # 'YYYY-MM' -> (changes, removed teams, removed games)
+        self.read = None
+
+    def clear(self):
+        self.periods.clear()
+        self.unread.clear()
+
+    def attach(self, periods, read):
+        # Months with a summary on disk; read(period) returns its rows
+        self.read = read
+        for period in periods:
+            self.unread[period] = ([], set(), set())
+
+    def index(self, period):
+        unread = self.unread.pop(period, None)
+        if unread is not None:
+            changes, teams, games = unread
+            index = self.periods[period] = GameScoreIndex()
+            index.load_rows(row for row in self.read(period) if row[0] not in games and row[1] not in teams)
+            for added, game, team, won in changes:
+                if added:
+                    index.add(game, team, won)
+                else:
+                    index.discard(game, team, won)
+        return self.periods.get(period)
+
+    def add(self, period, game, team, won):
+        unread = self.unread.get(period)
+        if unread is not None:
+            unread[0].append((True, game, team, won))
+            return
+        index = self.periods.get(period)
+        if index is None:
+            index = self.periods[period] = GameScoreIndex()
+        index.add(game, team, won)
+
+    def discard(self, period, game, team, won):
+        unread = self.unread.get(period)
+        if unread is not None:
+            unread[0].append((False, game, team, won))
+        elif period in self.periods:
+            self.periods[period].discard(game, team, won)
+
+    def remove_team(self, team):
+        for index in self.periods.values():
+            index.remove_team(team)
+        for changes, teams, _ in self.unread.values():
+            changes[:] = [change for change in changes if change[2] != team]
+            teams.add(team)
+
+    def remove_game(self, game):
+        for index in self.periods.values():
+            index.remove_game(game)
+        for changes, _, games in self.unread.values():
+            changes[:] = [change for change in changes if change[1] != game]
+            games.add(game)
+
+    def rows(self, period):
+        index = self.index(period)
+        return list(index.rows()) if index is not None else []
+
+    def keys(self):
+        # Months with results, oldest first.  A month not read yet has
+        # results unless teams or games were removed since its summary.
+        for period, (_, teams, games) in list(self.unread.items()):
+            if teams or games:
+                self.index(period)
+        periods = set(self.unread)
+        periods.update(period for period, index in self.periods.items() if index.scores)
+        periods.discard(UNDATED)
+        return sorted(periods)
+
+    def scoreboard(self, period, game=None):
+        # (team, wins, appearances) over a month or a year, most wins first
+        totals = {}
+        for key in [key for key in list(self.periods) + list(self.unread) if in_period(key, period)]:
+            for title, table in self.index(key).scores.items():
+                if game is not None and title != game:
+                    continue
+                for team, (wins, played) in table.items():
+                    entry = totals.setdefault(team, [0, 0])
+                    entry[0] += wins
+                    entry[1] += played
+        rows = [(team, wins, played) for team, (wins, played) in totals.items()]
+        rows.sort(key=lambda x: x[1], reverse=True)
+        return rows
+
+
+class MatchTimeline:
+    """Match row ids kept sorted by date (ties in insertion order).
+
+    Dates are parsed once when a match is added; the queries below are a
+    binary search plus a slice of the result.
+    """
+
+    def __init__(self):
+        self.days = array('i')  # date ordinals, sorted
+        self.rows = array('i')  # match row at the same position in self.days
+
+    def __len__(self):
+        return len(self.rows)
+
+    def clear(self):
+        self.days = array('i')
+        self.rows = array('i')
+
+    def add(self, ordinal, row):
+        if not self.days or ordinal >= self.days[-1]:
+            # Matches are usually recorded in date order
+            self.days.append(ordinal)
+            self.rows.append(row)
+        else:
+            position = bisect_right(self.days, ordinal)
+            self.days.insert(position, ordinal)
+            self.rows.insert(position, row)
+
+    def remove(self, entries):
+        # Remove (ordinal, row) entries.  A few are found by binary search
+        # on their date; for many, one filtering pass beats shifting the
+        # arrays once per entry.
+        if len(entries) * 64 < len(self.rows):
+            for ordinal, row in entries:
+                position = bisect_left(self.days, ordinal)
+                end = bisect_right(self.days, ordinal)
+                while position < end:
+                    if self.rows[position] == row:
+                        del self.days[position]
+                        del self.rows[position]
+                        break
+                    position += 1
+            return
+
+        dead = {row for _, row in entries}
+        keep = [position for position, row in enumerate(self.rows) if row not in dead]
+        self.days = array('i', [self.days[position] for position in keep])
+        self.rows = array('i', [self.rows[position] for position in keep])
+
+    def latest(self, count):
+        # The `count` most recent rows, newest first
+        if count <= 0:
+            return []
+        return self.rows[:-count - 1:-1].tolist()
+
+    def between(self, start, end):
+        # Rows dated from `start` to `end` inclusive, oldest first
+        low = bisect_left(self.days, start.toordinal())
+        high = bisect_right(self.days, end.toordinal())
+        return self.rows[low:high].tolist()
+
+
+class MatchRowIndex:
+    """Match rows per team, per pair of teams and per game.
+
+    Teams and games are the integer ids of the match log's name tables; a
+    pair is keyed by its two team ids in ascending order.  Rows are kept in
+    recording order.
+    """
+
+    def __init__(self):
+        self.by_team = {}  # team -> array of rows
+        self.by_pair = {}  # (team, team) -> array of rows
+        self.by_game = {}  # game -> array of rows
+
+    def clear(self):
+        self.by_team.clear()
+        self.by_pair.clear()
+        self.by_game.clear()
+
+    def keys(self, game, team1, team2):
+        # (index, key) of every list a row belongs to
+        pair = (team1, team2) if team1 <= team2 else (team2, team1)
+        keys = [(self.by_team, team1), (self.by_pair, pair), (self.by_game, game)]
+        if team2 != team1:
+            keys.append((self.by_team, team2))
+        return keys
+
+    def add(self, game, team1, team2, row):
+        for index, key in self.keys(game, team1, team2):
+            rows = index.get(key)
+            if rows is None:
+                rows = index[key] = array('i')
+            rows.append(row)
+
+    def team_rows(self, team):
+        return self.by_team.get(team, ())
+
+    def pair_rows(self, team1, team2):
+        key = (team1, team2) if team1 <= team2 else (team2, team1)
+        return self.by_pair.get(key, ())
+
+    def game_rows(self, game):
+        return self.by_game.get(game, ())
+
+    def remove_rows(self, rows, columns):
+        # Take rows out of every list they are in; each affected list is
+        # filtered once, so the cost is the size of those lists
+        dead = set(rows)
+        affected = {}
+        for row in dead:
+            for index, key in self.keys(columns.game[row], columns.team1[row], columns.team2[row]):
+                affected[id(index), key] = index
+        for (_, key), index in affected.items():
+            rows = array('i', (row for row in index[key] if row not in dead))
+            if rows:
+                index[key] = rows
+            else:
+                del index[key]
+
+
+class Tombstones:
+    """Sorted rows deleted from the append-only match log.
+
+    Rows are only really dropped when the log is rewritten at the next
+    checkpoint.  ``row`` maps a position among the live rows to its row
+    with one binary search, so paging skips deleted rows without a scan.
+    """
+
+    def __init__(self):
+        self.rows = array('i')
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, row):
+        position = bisect_left(self.rows, row)
+        return position < len(self.rows) and self.rows[position] == row
+
+    def add(self, rows):
+        if len(rows) * 64 < len(self.rows):
+            for row in rows:
+                if row not in self:
+                    self.rows.insert(bisect_left(self.rows, row), row)
+        else:
+            self.rows = array('i', sorted(set(self.rows).union(rows)))
+
+    def row(self, position):
+        # rows[i] - i live rows come before the i-th deleted row
+        deleted = self.rows
+        low, high = 0, len(deleted)
+        while low < high:
+            middle = (low + high) // 2
+            if deleted[middle] - middle <= position:
+                low = middle + 1
+            else:
+                high = middle
+        return position + low
+
+
+class PrefixIndex:
+    """Names kept sorted case-insensitively for search-as-you-type.
+
+    All names starting with a prefix are adjacent in the sorted list, so
+    a lookup is one binary search plus the matches returned.
+    """
+
+    def __init__(self, names=()):
+        pairs = sorted((name.casefold(), name) for name in names)
+        self.keys = [key for key, _ in pairs]
+        self.names = [name for _, name in pairs]
+
+    def __contains__(self, name):
+        key = name.casefold()
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.names[position] == name:
+                return True
+            position += 1
+        return False
+
+    def search(self, prefix, limit=None):
+        # Names starting with `prefix` (ignoring case), alphabetically
+        key = prefix.strip().casefold()
+        position = bisect_left(self.keys, key)
+        end = len(self.keys) if limit is None else min(len(self.keys), position + limit)
+        found = []
+        while position < end and self.keys[position].startswith(key):
+            found.append(self.names[position])
+            position += 1
+        return found
@@ -0,0 +1,228 @@
+import cProfile
+import csv
+import io
+import json
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Upper bounds (seconds) of the duration histogram buckets; one more
+# bucket holds everything slower
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Durations kept per operation for the percentiles
+SAMPLES = 1000
+
+# Spans kept for a trace export
+TRACE_LENGTH = 20000
+
+# Repository methods timed by instrument_repository
+DATA_OPERATIONS = (
+    'load', 'flush', 'refresh', 'read_history', 'attach_history',
+    'add_team', 'remove_team', 'add_game', 'remove_game', 'add_match', 'add_matches',
+    'match_count', 'matches', 'last_matches', 'matches_between',
+    'overall_scoreboard', 'standings', 'scored_games', 'game_scoreboard', 'periods', 'period_scoreboard',
+    'team_matches', 'pair_matches', 'head_to_head', 'win_streaks', 'rating_book', 'rating_leaderboard',
+)
+
+
+def bucket_label(index):
+    if index == len(BUCKETS):
+        return f">= {BUCKETS[-1] * 1000:g} ms"
+    return f"< {BUCKETS[index] * 1000:g} ms"
+
+
+class OperationStats:
+    """Call count, durations and row counts of one timed operation.
+
+    The histogram and totals cover every call; the percentiles are taken
+    over the last SAMPLES calls.
+    """
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=SAMPLES)
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, duration, rows):
+        self.calls += 1
+        self.total += duration
+        self.slowest = max(self.slowest, duration)
+        if rows is not None:
+            self.rows += rows
+        self.samples.append(duration)
+        self.histogram[bisect_left(BUCKETS, duration)] += 1
+
+    def percentile(self, fraction):
+        # Nearest-rank percentile of the recent samples
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+    def summary(self):
+        return {
+            'kind': self.kind,
+            'name': self.name,
+            'calls': self.calls,
+            'total': self.total,
+            'mean': self.total / self.calls if self.calls else 0.0,
+            'p50': self.percentile(0.50),
+            'p99': self.percentile(0.99),
+            'max': self.slowest,
+            'rows': self.rows,
+            'histogram': {bucket_label(i): count for i, count in enumerate(self.histogram)},
+        }
+
+
+class Span:
+    # Handed out by Instruments.span; set `rows` to record a row count
+    __slots__ = ('rows',)
+
+    def __init__(self):
+        self.rows = None
+
+
+class Instruments:
+    """Timings of data operations and view renders.
+
+    ``span(kind, name)`` times a block; ``wrap`` and
+    ``instrument_repository`` time whole functions.  Spans may nest and
+    may be opened from any thread.  Each one updates the statistics of its
+    operation and is appended to a bounded trace that ``export_json``
+    (Chrome trace event format) and ``export_csv`` write out.
+
+    ``start_profile``/``stop_profile`` run cProfile over a single user
+    action; the GUI decides where an action starts and ends.
+    """
+
+    def __init__(self):
+        self.stats = {}  # (kind, name) -> OperationStats
+        self.trace = deque(maxlen=TRACE_LENGTH)
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+        self.profiler = None
+        self.profile = None  # (action, pstats.Stats) of the last capture
+
+    @contextmanager
+    def span(self, kind, name):
+        span = Span()
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            self.record(kind, name, start, time.perf_counter() - start, span.rows)
+
+    def record(self, kind, name, start, duration, rows=None):
+        with self.lock:
+            stats = self.stats.get((kind, name))
+            if stats is None:
+                stats = self.stats[(kind, name)] = OperationStats(kind, name)
+            stats.add(duration, rows)
+            self.trace.append((start - self.origin, kind, name, duration, rows, threading.get_ident()))
+
+    def wrap(self, kind, name, function, finish=None):
+        # `function` timed under `name`, including `finish()` if given (a
+        # view's pending layout); list results count as rows
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            rows = None
+            try:
+                result = function(*args, **kwargs)
+                if finish is not None:
+                    finish()
+                if isinstance(result, list):
+                    rows = len(result)
+                return result
+            finally:
+                self.record(kind, name, start, time.perf_counter() - start, rows)
+        return timed
+
+    def instrument_repository(self, repository, names=DATA_OPERATIONS):
+        # Time the repository's data operations on this instance only; the
+        # CLI and other users of the class are not affected
+        for name in names:
+            setattr(repository, name, self.wrap('data', name, getattr(repository, name)))
+
+    def summary(self):
+        # Statistics per operation, most total time first
+        with self.lock:
+            rows = [stats.summary() for stats in self.stats.values()]
+        return sorted(rows, key=lambda row: row['total'], reverse=True)
+
+    def histogram(self, kind, name):
+        # [(bucket label, calls)] of one operation
+        with self.lock:
+            stats = self.stats.get((kind, name))
+            counts = list(stats.histogram) if stats is not None else [0] * (len(BUCKETS) + 1)
+        return [(bucket_label(i), count) for i, count in enumerate(counts)]
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+            self.trace.clear()
+
+    def export_json(self, path):
+        # Chrome trace event format (chrome://tracing, Perfetto), with the
+        # per-operation summary alongside
+        with self.lock:
+            spans = list(self.trace)
+        events = [{'name': name, 'cat': kind, 'ph': 'X', 'ts': round(start * 1e6, 1),
+                   'dur': round(duration * 1e6, 1), 'pid': 0, 'tid': thread,
+                   'args': {} if rows is None else {'rows': rows}}
+                  for start, kind, name, duration, rows, thread in spans]
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'operations': self.summary()}, file, indent=1)
+
+    def export_csv(self, path):
+        with self.lock:
+            spans = list(self.trace)
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['start_ms', 'kind', 'name', 'duration_ms', 'rows', 'thread'])
+            for start, kind, name, duration, rows, thread in spans:
+                writer.writerow([f"{start * 1000:.3f}", kind, name, f"{duration * 1000:.3f}",
+                                 '' if rows is None else rows, thread])
+
+    # Profiling a single action
+
+    def profiling(self):
+        return self.profiler is not None
+
+    def start_profile(self):
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop_profile(self, action):
+        if self.profiler is None:
+            return
+        profiler, self.profiler = self.profiler, None
+        profiler.disable()
+        self.profile = (action, pstats.Stats(profiler))
+
+    def profile_report(self, limit=30):
+        # Text of the last capture, functions by cumulative time
+        if self.profile is None:
+            return ""
+        action, stats = self.profile
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats('cumulative').print_stats(limit)
+        return f"Profile of {action}\n{out.getvalue()}"
+
+    def dump_profile(self, path):
+        # The last capture in pstats format (snakeviz, python -m pstats)
+        if self.profile is not None:
+            self.profile[1].dump_stats(path)
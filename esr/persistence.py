@@ -0,0 +1,66 @@
+import queue
+import threading
+import time
+
+# How long the worker waits for more changes before flushing a burst
+COALESCE_SECONDS = 0.25
+
+_STOP = object()
+
+
+class PersistenceWorker:
+    """Flushes a repository on a background thread.
+
+    ``request()`` is cheap and never blocks: requests that arrive while the
+    worker is flushing or waiting out the coalescing window are served by
+    a single ``repository.flush()``.  The outcome of every flush (None or
+    the exception) is put on ``results`` for the GUI to pick up from its
+    own thread.  ``stop()`` performs the final flush and joins the thread.
+    """
+
+    def __init__(self, repository, coalesce=COALESCE_SECONDS):
+        self.repository = repository
+        self.coalesce = coalesce
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='esr-persistence', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def request(self):
+        self.requests.put(None)
+
+    def drain(self):
+        # Take every queued request; True if a stop was among them
+        stop = False
+        while True:
+            try:
+                stop = self.requests.get_nowait() is _STOP or stop
+            except queue.Empty:
+                return stop
+
+    def run(self):
+        while True:
+            stop = self.requests.get() is _STOP
+            if not stop:
+                time.sleep(self.coalesce)
+            stop = self.drain() or stop
+
+            try:
+                self.repository.flush()
+                self.results.put(None)
+            except Exception as error:
+                self.results.put(error)
+
+            if stop:
+                return
+
+    def stop(self, timeout=None):
+        # Flush whatever is still pending and wait for the thread to end
+        if self.thread.is_alive():
+            self.requests.put(_STOP)
+            self.thread.join(timeout)
+
+    def busy(self):
+        return not self.requests.empty()
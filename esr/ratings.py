@@ -0,0 +1,222 @@
+import math
+
+from esr.columnar import NameTable
+
+ELO_INITIAL = 1500.0
+ELO_K = 32.0
+
+# Glicko-2 defaults (Glickman, "Example of the Glicko-2 system")
+GLICKO_RD = 350.0
+GLICKO_VOLATILITY = 0.06
+GLICKO_TAU = 0.5
+GLICKO_SCALE = 173.7178
+GLICKO_EPSILON = 0.000001
+
+
+def elo_expected(rating, opponent):
+    # Expected score (win probability) of `rating` against `opponent`
+    return 1.0 / (1.0 + 10.0 ** ((opponent - rating) / 400.0))
+
+
+def glicko2_update(player, opponent, score, tau=GLICKO_TAU):
+    # One Glicko-2 rating period with a single game; player and opponent
+    # are (rating, rd, volatility) on the Glicko scale
+    mu = (player[0] - ELO_INITIAL) / GLICKO_SCALE
+    phi = player[1] / GLICKO_SCALE
+    sigma = player[2]
+    mu_j = (opponent[0] - ELO_INITIAL) / GLICKO_SCALE
+    phi_j = opponent[1] / GLICKO_SCALE
+
+    g = 1.0 / math.sqrt(1.0 + 3.0 * phi_j * phi_j / (math.pi * math.pi))
+    expected = 1.0 / (1.0 + math.exp(-g * (mu - mu_j)))
+    v = 1.0 / (g * g * expected * (1.0 - expected))
+    delta = v * g * (score - expected)
+
+    # New volatility by the Illinois algorithm
+    a = math.log(sigma * sigma)
+
+    def f(x):
+        ex = math.exp(x)
+        return (ex * (delta * delta - phi * phi - v - ex) / (2.0 * (phi * phi + v + ex) ** 2)
+                - (x - a) / (tau * tau))
+
+    low = a
+    if delta * delta > phi * phi + v:
+        high = math.log(delta * delta - phi * phi - v)
+    else:
+        k = 1
+        while f(a - k * tau) < 0:
+            k += 1
+        high = a - k * tau
+    f_low, f_high = f(low), f(high)
+    while abs(high - low) > GLICKO_EPSILON:
+        middle = low + (low - high) * f_low / (f_high - f_low)
+        f_middle = f(middle)
+        if f_middle * f_high <= 0:
+            low, f_low = high, f_high
+        else:
+            f_low /= 2.0
+        high, f_high = middle, f_middle
+    sigma = math.exp(low / 2.0)
+
+    phi_star = math.sqrt(phi * phi + sigma * sigma)
+    phi = 1.0 / math.sqrt(1.0 / (phi_star * phi_star) + 1.0 / v)
+    mu = mu + phi * phi * g * (score - expected)
+    return (mu * GLICKO_SCALE + ELO_INITIAL, phi * GLICKO_SCALE, sigma)
+
+
+class RatingBook:
+    """Elo (and optionally Glicko-2) ratings, overall and per game.
+
+    ``record`` updates the ratings of one match in O(1).  ``replay``
+    recomputes everything from the match log in recording order, which is
+    the order ``record`` sees; Elo is order dependent, so the replay is a
+    single tight pass over integer team ids rather than a batched
+    computation.  Matches whose winner did not play are ignored.
+    """
+
+    def __init__(self, k=ELO_K, initial=ELO_INITIAL, glicko=False):
+        self.k = k
+        self.initial = initial
+        self.glicko = glicko
+        self.clear()
+
+    def clear(self):
+        self.teams = NameTable()
+        self.games = NameTable()
+        self.elo = []  # team id -> overall rating
+        self.played = []  # team id -> rated matches
+        self.game_elo = {}  # game id -> {team id: rating}
+        self.game_played = {}  # game id -> {team id: rated matches}
+        self.glicko_ratings = {}  # team id -> (rating, rd, volatility)
+
+    def team_id(self, name):
+        team = self.teams.intern(name)
+        if team == len(self.elo):
+            self.elo.append(self.initial)
+            self.played.append(0)
+        return team
+
+    def record(self, game, team1, team2, winner):
+        if winner == team1:
+            score = 1.0
+        elif winner == team2:
+            score = 0.0
+        else:
+            return
+        self.rate(self.games.intern(game), self.team_id(team1), self.team_id(team2), score)
+
+    def rate(self, game, team1, team2, score):
+        k = self.k
+        elo = self.elo
+        rating1, rating2 = elo[team1], elo[team2]
+        change = k * (score - elo_expected(rating1, rating2))
+        elo[team1] = rating1 + change
+        elo[team2] = rating2 - change
+        self.played[team1] += 1
+        self.played[team2] += 1
+
+        ratings = self.game_elo.setdefault(game, {})
+        played = self.game_played.setdefault(game, {})
+        rating1, rating2 = ratings.get(team1, self.initial), ratings.get(team2, self.initial)
+        change = k * (score - elo_expected(rating1, rating2))
+        ratings[team1] = rating1 + change
+        ratings[team2] = rating2 - change
+        played[team1] = played.get(team1, 0) + 1
+        played[team2] = played.get(team2, 0) + 1
+
+        if self.glicko:
+            default = (self.initial, GLICKO_RD, GLICKO_VOLATILITY)
+            player1 = self.glicko_ratings.get(team1, default)
+            player2 = self.glicko_ratings.get(team2, default)
+            self.glicko_ratings[team1] = glicko2_update(player1, player2, score)
+            self.glicko_ratings[team2] = glicko2_update(player2, player1, 1.0 - score)
+
+    def replay(self, results):
+        # Recompute from (game, team1, team2, winner) name rows
+        self.clear()
+        for game, team1, team2, winner in results:
+            self.record(game, team1, team2, winner)
+
+    def replay_columns(self, columns, deleted=()):
+        # Recompute straight from MatchColumns, reusing its name ids and
+        # skipping the rows in `deleted`
+        self.clear()
+        self.teams.names = list(columns.teams.names)
+        self.teams.ids = dict(columns.teams.ids)
+        self.games.names = list(columns.games.names)
+        self.games.ids = dict(columns.games.ids)
+        self.elo = [self.initial] * len(self.teams)
+        self.played = [0] * len(self.teams)
+
+        if self.glicko:
+            rate = self.rate
+            for row, (game, team1, team2, winner) in enumerate(
+                    zip(columns.game, columns.team1, columns.team2, columns.winner)):
+                if row in deleted:
+                    continue
+                if winner == team1:
+                    rate(game, team1, team2, 1.0)
+                elif winner == team2:
+                    rate(game, team1, team2, 0.0)
+            return
+
+        # Elo only: the same arithmetic as rate(), with elo_expected
+        # written out in place, as a call per update shows in this loop
+        k = self.k
+        initial = self.initial
+        elo = self.elo
+        played = self.played
+        game_elo = self.game_elo
+        game_played = self.game_played
+        for row, (game, team1, team2, winner) in enumerate(
+                zip(columns.game, columns.team1, columns.team2, columns.winner)):
+            if row in deleted:
+                continue
+            if winner == team1:
+                score = 1.0
+            elif winner == team2:
+                score = 0.0
+            else:
+                continue
+            rating1 = elo[team1]
+            rating2 = elo[team2]
+            change = k * (score - 1.0 / (1.0 + 10.0 ** ((rating2 - rating1) / 400.0)))
+            elo[team1] = rating1 + change
+            elo[team2] = rating2 - change
+            played[team1] += 1
+            played[team2] += 1
+
+            ratings = game_elo.get(game)
+            if ratings is None:
+                ratings = game_elo[game] = {}
+                game_played[game] = {}
+            counts = game_played[game]
+            rating1 = ratings.get(team1, initial)
+            rating2 = ratings.get(team2, initial)
+            change = k * (score - 1.0 / (1.0 + 10.0 ** ((rating2 - rating1) / 400.0)))
+            ratings[team1] = rating1 + change
+            ratings[team2] = rating2 - change
+            counts[team1] = counts.get(team1, 0) + 1
+            counts[team2] = counts.get(team2, 0) + 1
+
+    def leaderboard(self, game=None, system='elo', include=None):
+        # (team, rating, rated matches) best first; `include` filters names
+        names = self.teams.names
+        if system == 'glicko2':
+            rows = [(names[team], rating[0], rating[1]) for team, rating in self.glicko_ratings.items()]
+            rows = [row for row in rows if include is None or include(row[0])]
+            rows.sort(key=lambda x: x[1], reverse=True)
+            return rows
+
+        if game is None:
+            rows = [(names[team], self.elo[team], self.played[team])
+                    for team in range(len(names)) if self.played[team]]
+        else:
+            game_id = self.games.get(game)
+            ratings = self.game_elo.get(game_id, {})
+            played = self.game_played.get(game_id, {})
+            rows = [(names[team], rating, played[team]) for team, rating in ratings.items()]
+        rows = [row for row in rows if include is None or include(row[0])]
+        rows.sort(key=lambda x: x[1], reverse=True)
+        return rows
@@ -0,0 +1,929 @@
+import threading
+from datetime import date
+
+from esr.columnar import MatchColumns
+from esr.indexes import (UNDATED, GameScoreIndex, MatchRowIndex, MatchTimeline, PeriodScoreIndex, Tombstones,
+                         date_ordinal, parse_date, period_of, period_range)
+from esr.ratings import ELO_K, RatingBook
+from esr.storage import DATA_DIR, CSVStore
+
+BACKENDS = ('csv', 'sqlite')
+
+
+def match_dict(day, row):
+    # A (date, game, team1, team2, winner) row as returned by the queries
+    return {
+        'date': date.fromordinal(day).isoformat(),
+        'game': row[1],
+        'team1': row[2],
+        'team2': row[3],
+        'winner': row[4]
+    }
+
+
+class Repository:
+    """Everything ESRTracker reads and writes goes through this interface.
+
+    Matches are returned as dicts with 'date', 'game', 'team1', 'team2' and
+    'winner' keys; dates are YYYY-MM-DD strings.
+
+    Changes are visible to queries immediately.  They are made durable by
+    ``flush`` (called after every change while ``autoflush`` is set), which
+    may run on another thread than the one making changes.
+
+    ``revision`` goes up whenever the data changes, whether by this
+    repository or by another process's changes picked up by ``refresh``
+    or a flush; views compare it to tell whether to redraw.
+
+    ``pending_removals`` is non-zero while a removal waits for the match
+    history; until then ``teams`` and the scoreboards read the history
+    first, so a GUI should wait for its background load instead.
+    """
+
+    autoflush = True
+    revision = 0
+    pending_removals = 0
+
+    def load(self):
+        # Load what the main menu and scoreboards need; the match history
+        # may be left for load_history
+        pass
+
+    def flush(self):
+        pass
+
+    def save(self):
+        # Flush and compact the storage
+        self.flush()
+
+    def close(self):
+        pass
+
+    # Match history
+
+    def history_loaded(self):
+        return True
+
+    def read_history(self, progress=None):
+        # Read the match history without touching shared state, so it can
+        # run on a worker thread; the result goes to attach_history
+        return None
+
+    def attach_history(self, state):
+        pass
+
+    def load_history(self, progress=None):
+        if not self.history_loaded():
+            self.attach_history(self.read_history(progress))
+
+    def refresh(self):
+        # Pick up changes other processes made to the same database; True
+        # if there were any
+        return False
+
+    def take_conflicts(self):
+        # (op, fields) changes that were dropped because another process
+        # removed a team or game they refer to; cleared by the call
+        return []
+
+    # Teams and games
+
+    def teams(self):
+        # (name, score) pairs in insertion order
+        raise NotImplementedError
+
+    def team_names(self):
+        # Names only, in the same order; never waits for the history
+        return [name for name, _ in self.teams()]
+
+    def has_team(self, name):
+        raise NotImplementedError
+
+    def add_team(self, name, score=0):
+        raise NotImplementedError
+
+    def remove_team(self, name):
+        raise NotImplementedError
+
+    def games(self):
+        raise NotImplementedError
+
+    def has_game(self, title):
+        raise NotImplementedError
+
+    def add_game(self, title):
+        raise NotImplementedError
+
+    def remove_game(self, title):
+        raise NotImplementedError
+
+    # Matches
+
+    def add_match(self, match_date, game, team1, team2, winner):
+        raise NotImplementedError
+
+    def add_matches(self, matches):
+        # Add (date, game, team1, team2, winner) rows as one change
+        autoflush, self.autoflush = self.autoflush, False
+        try:
+            for match in matches:
+                self.add_match(*match)
+        finally:
+            self.autoflush = autoflush
+        if autoflush:
+            self.flush()
+
+    def match_count(self):
+        raise NotImplementedError
+
+    def matches(self, start, stop):
+        # Matches in recording order, sliced like a list (the CSV backend
+        # groups them by month once they are checkpointed)
+        raise NotImplementedError
+
+    def last_matches(self, count):
+        # The `count` most recent matches by date, newest first
+        raise NotImplementedError
+
+    def matches_between(self, start, end):
+        # Matches dated from `start` to `end` inclusive, oldest first
+        raise NotImplementedError
+
+    def matches_on(self, day):
+        return self.matches_between(day, day)
+
+    # Scoreboards
+
+    def overall_scoreboard(self):
+        # (team, score) sorted by score in descending order
+        raise NotImplementedError
+
+    def standings(self):
+        # (team, score, wins, appearances) of every team, the wins and
+        # appearances over all games, sorted by score in descending order
+        raise NotImplementedError
+
+    def scored_games(self):
+        # Sorted titles of the games that have results
+        raise NotImplementedError
+
+    def game_scoreboard(self, game):
+        # (team, wins, appearances) sorted by wins in descending order
+        raise NotImplementedError
+
+    def periods(self):
+        # 'YYYY-MM' months that have results, oldest first
+        raise NotImplementedError
+
+    def period_scoreboard(self, period, game=None):
+        # (team, wins, appearances) over a 'YYYY' year or 'YYYY-MM' month,
+        # overall or for one game, sorted by wins in descending order
+        raise NotImplementedError
+
+    # Team history
+
+    def team_matches(self, team):
+        # Matches the team played, oldest first by date
+        raise NotImplementedError
+
+    def pair_matches(self, team1, team2):
+        # Matches between the two teams, oldest first by date
+        raise NotImplementedError
+
+    def head_to_head(self, team1, team2):
+        # (team1 wins, team2 wins, matches played) between the two teams
+        matches = self.pair_matches(team1, team2)
+        wins1 = sum(1 for match in matches if match['winner'] == team1)
+        wins2 = sum(1 for match in matches if match['winner'] == team2)
+        return wins1, wins2, len(matches)
+
+    def win_streaks(self, team):
+        # (current, longest) runs of consecutive wins by date
+        current = longest = 0
+        for match in self.team_matches(team):
+            if match['winner'] == team:
+                current += 1
+                longest = max(longest, current)
+            else:
+                current = 0
+        return current, longest
+
+    # Ratings
+
+    def rating_book(self):
+        # The RatingBook, up to date with every recorded match
+        raise NotImplementedError
+
+    def configure_ratings(self, k=ELO_K, glicko=False):
+        # Change the rating parameters; ratings are recomputed from history
+        raise NotImplementedError
+
+    def rating_leaderboard(self, game=None, system='elo'):
+        # (team, rating, rated matches) best first, existing teams only;
+        # for system='glicko2' the third value is the rating deviation
+        teams = {name for name, _ in self.teams()}
+        return self.rating_book().leaderboard(game, system, include=teams.__contains__)
+
+
+class CSVRepository(Repository):
+    """In-memory tables and indexes persisted to CSV files plus a journal.
+
+    ``load`` only reads teams, games and the per-game score snapshot (month
+    summaries are read when first needed); the match log (a MatchColumns)
+    is read by ``read_history``/``attach_history``.  Matches recorded before that are
+    kept in ``pending`` and appended afterwards.  Until then the most recent
+    matches and date ranges are read from just the month segments they
+    fall in.
+
+    A checkpoint rewrites the segments of the months in ``dirty_periods``,
+    the ones whose matches were added to or removed since the last one.
+
+    Removing a team or game deletes its matches.  Deleted rows stay in the
+    arrays as ``tombstones`` until the next checkpoint rewrites their months.
+
+    Other processes may use the same directory.  Every flush takes the
+    directory lock and first merges what they journalled since we last
+    looked; our own changes are appended after theirs, and matches whose
+    team or game they removed in the meantime are dropped as conflicts.
+
+    With ``read_only`` set before ``load`` the files are never rewritten:
+    a database that needs its indexes rebuilt is rebuilt in memory only,
+    and no checkpoint is taken.  Set ``autoflush`` off as well and make no
+    changes; ``migrate_csv`` reads a CSV database this way.
+    """
+
+    read_only = False
+
+    def __init__(self, directory=DATA_DIR):
+        # Changes applied in memory but not yet journalled.  `lock` guards
+        # the in-memory state against flush() taking a snapshot from the
+        # persistence thread; `flush_lock` serialises flushes.
+        self.unflushed = []
+        self.conflicts = []
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()
+        # Bumped whenever the state is reloaded; a history read for an
+        # older generation is not attached
+        self.generation = 0
+
+        # Checkpointed CSV files plus an append-only journal of changes
+        self.store = CSVStore(directory)
+
+        self.ratings = RatingBook()
+        self.reset_state()
+
+    def reset_state(self):
+        self.generation += 1
+        self.revision += 1
+        self.teams_table = {}
+        self.games_table = {}
+        # The match log, stored column-wise with interned names
+        self.columns = MatchColumns()
+        self.tombstones = Tombstones()
+        self.pending = []  # (op, fields) waiting for the history
+        self.pending_removals = 0  # del_team/del_game entries among them
+        self.history_ready = False
+
+        # Wins and appearances per team for every game, kept up to date
+        # as matches are recorded and teams/games are removed
+        self.game_scores = GameScoreIndex()
+
+        # The same per month, the summaries written with each segment
+        self.period_scores = PeriodScoreIndex()
+        self.dirty_periods = set()
+
+        # Sorted scoreboards, built on first use and dropped on any change
+        self.views = {}
+
+        # Matches ordered by date for "last N" and date-range queries
+        self.timeline = MatchTimeline()
+
+        # Match rows per team, pair of teams and game, for team history
+        # queries and for finding the matches a removal deletes
+        self.match_index = MatchRowIndex()
+
+        # Elo/Glicko-2 ratings, recomputed with the history and then
+        # updated match by match; deleting matches makes them stale
+        self.ratings = RatingBook(self.ratings.k, glicko=self.ratings.glicko)
+        self.ratings_stale = False
+
+    def load(self):
+        # Load teams, games and the score snapshot of the last checkpoint,
+        # then replay the journal
+        teams, games, game_scores, periods, entries = self.store.load()
+        self.teams_table.update(teams)
+        self.games_table.update(games)
+
+        rebuild = game_scores is None or periods is None
+        if rebuild:
+            # Written before score snapshots or month segments existed:
+            # build the indexes from the full history once; the checkpoint
+            # below snapshots them and splits the log into segments
+            self.attach_history(self.read_history())
+            self.rebuild_indexes()
+            self.dirty_periods.update(period_of(day) for day in set(self.columns.day))
+        else:
+            self.game_scores.load_rows(game_scores)
+            self.period_scores.attach(periods, self.store.read_summary)
+
+        for op, fields in entries:
+            self.apply(op, fields)
+
+        if rebuild and not self.read_only:
+            self.save()
+
+    def flush(self, checkpoint=False):
+        # Journal the unflushed changes with one fsync and, every
+        # CHECKPOINT_EVERY entries, rewrite the CSV files from a snapshot
+        # taken together with those changes
+        if self.autoflush and not self.checkpoint_ready() and (
+                checkpoint or self.store.needs_checkpoint(len(self.unflushed))):
+            # Headless callers have no background history load to wait
+            # for, so read it now
+            self.load_history()
+        with self.flush_lock, self.store.lock:
+            with self.lock:
+                self.merge(self.store.changes())
+                entries, self.unflushed = self.unflushed, []
+                snapshot = None
+                if not self.read_only and self.checkpoint_ready() and (
+                        checkpoint or self.store.needs_checkpoint(len(entries))):
+                    early = not self.history_ready
+                    dirty, self.dirty_periods = self.dirty_periods, set()
+                    segments = self.segments(dirty) if not early else self.pending_segments(dirty)
+                    if segments is None:
+                        self.dirty_periods |= dirty
+                    else:
+                        snapshot = (dict(self.teams_table), list(self.games_table),
+                                    segments, list(self.game_scores.rows()))
+
+            if entries:
+                try:
+                    self.store.log(entries)
+                except Exception:
+                    with self.lock:
+                        self.unflushed[:0] = entries
+                    raise
+            if snapshot is not None:
+                try:
+                    self.store.checkpoint(*snapshot)
+                except Exception:
+                    with self.lock:
+                        self.dirty_periods |= dirty
+                    raise
+                if early:
+                    # The history still to be read is that of the files
+                    # just replaced; start over from the new ones
+                    with self.lock:
+                        self.reload()
+
+    def checkpoint_ready(self):
+        # A checkpoint needs the history if a removal is waiting for it
+        # (its matches have to come out of every month); otherwise the
+        # months that changed are their segment plus the pending matches.
+        # None is taken while a history read is under way: it would replace
+        # the files that read is for.
+        if self.history_ready:
+            return True
+        return not (self.pending_removals or self.store.legacy or self.store.reading
+                    or self.store.segment_periods() is None)
+
+    def refresh(self):
+        # Apply what other processes journalled since the last call and
+        # return True if there was anything.  Never waits for the directory
+        # lock or a flush in progress: if busy, try again later.
+        if not self.flush_lock.acquire(blocking=False):
+            return False
+        try:
+            if not self.store.lock.acquire(blocking=False):
+                return False
+            try:
+                with self.lock:
+                    return self.merge(self.store.changes())
+            finally:
+                self.store.lock.release()
+        finally:
+            self.flush_lock.release()
+
+    def merge(self, entries):
+        # Bring in what other processes journalled since we last looked;
+        # `entries` is None if one of them checkpointed meanwhile.  Our
+        # unflushed changes will follow theirs in the journal.  When both
+        # sides only touched different teams and games the changes commute
+        # and theirs are simply applied; otherwise the state is reloaded
+        # from the files and ours applied again in journal order, dropping
+        # matches whose team or game no longer exists.  Called with the
+        # directory lock and `lock` held.
+        if entries == []:
+            return False
+
+        if entries is not None and self.commutes(entries):
+            for op, fields in entries:
+                self.apply(op, fields)
+            return True
+
+        self.reload()
+        return True
+
+    def reload(self):
+        # Start over from the files and journal on disk, then apply our
+        # unflushed changes again (dropping matches whose team or game is
+        # gone).  Called with the directory lock and `lock` held.
+        ours, self.unflushed = self.unflushed, []
+        self.store.close()
+        self.reset_state()
+        self.load()
+        for op, fields in ours:
+            if op == 'match':
+                game, team1, team2 = fields[1:4]
+                if not (game in self.games_table and team1 in self.teams_table and team2 in self.teams_table):
+                    self.conflicts.append((op, fields))
+                    continue
+            self.apply(op, fields)
+            self.unflushed.append((op, fields))
+
+    @staticmethod
+    def names(op, fields):
+        # ('team'|'game', name) pairs a journal entry refers to
+        if op == 'match':
+            return {('game', fields[1]), ('team', fields[2]), ('team', fields[3])}
+        return {('team' if op in ('team', 'del_team') else 'game', fields[0])}
+
+    def commutes(self, entries):
+        # True unless one side added or removed a team or game that the
+        # other side's changes refer to
+        ours_all, ours_structural = set(), set()
+        for op, fields in self.unflushed:
+            names = self.names(op, fields)
+            ours_all |= names
+            if op != 'match':
+                ours_structural |= names
+        for op, fields in entries:
+            names = self.names(op, fields)
+            if not names.isdisjoint(ours_all if op != 'match' else ours_structural):
+                return False
+        return True
+
+    def take_conflicts(self):
+        with self.lock:
+            conflicts, self.conflicts = self.conflicts, []
+            return conflicts
+
+    def save(self):
+        # Compact the journal into fresh CSV files
+        if not self.checkpoint_ready():
+            self.load_history()
+        self.flush(checkpoint=True)
+
+    def close(self):
+        # A checkpoint still held back for the history is taken now, so a
+        # journal written by short runs (the CLI, imports) is compacted
+        try:
+            if not self.read_only and self.store.needs_checkpoint(len(self.unflushed)):
+                self.save()
+        finally:
+            self.store.close()
+
+    def history_loaded(self):
+        return self.history_ready
+
+    def read_history(self, progress=None):
+        generation = self.generation
+        columns = MatchColumns()
+        timeline = MatchTimeline()
+        match_index = MatchRowIndex()
+        for row in self.store.read_matches(progress):
+            self.index_row(timeline, match_index, columns, columns.append(*row))
+        ratings = RatingBook(self.ratings.k, glicko=self.ratings.glicko)
+        ratings.replay_columns(columns)
+        return generation, columns, timeline, match_index, ratings
+
+    def attach_history(self, state):
+        with self.lock:
+            # A reload since the read means the history is out of date;
+            # history_loaded() stays False and it has to be read again
+            if self.history_ready or state[0] != self.generation:
+                return
+            self.columns, self.timeline, self.match_index, self.ratings = state[1:]
+            self.history_ready = True
+
+            # Matches and removals journalled since the checkpoint, in order.
+            # A team or game removed again further on already had its
+            # scores reset by apply() then, so a cascade leaves it alone.
+            removed_later = []
+            teams, games = set(), set()
+            for op, fields in reversed(self.pending):
+                removed_later.append((frozenset(teams), frozenset(games)))
+                if op == 'del_team':
+                    teams.add(fields[0])
+                elif op == 'del_game':
+                    games.add(fields[0])
+            for (op, fields), (teams, games) in zip(self.pending, reversed(removed_later)):
+                if op == 'match':
+                    self.append_match(fields)
+                else:
+                    self.cascade(op, fields[0], teams, games)
+            self.pending = []
+            self.pending_removals = 0
+            # Date queries no longer read the segments
+            self.store.close_segments()
+
+        # A checkpoint may have been held back until now
+        if self.autoflush and self.store.needs_checkpoint(len(self.unflushed)):
+            self.flush()
+
+    def rebuild_indexes(self):
+        # Recompute the scoreboard, date and team indexes from the match log
+        self.views.clear()
+        self.game_scores.clear()
+        self.period_scores.clear()
+        self.timeline.clear()
+        self.match_index.clear()
+        for row in range(len(self.columns)):
+            self.index_row(self.timeline, self.match_index, self.columns, row)
+            self.index_scores(*self.columns.values(row))
+
+    def index_row(self, timeline, match_index, columns, row):
+        # Rows with a malformed date (only possible in hand-edited files)
+        # are left out of date queries
+        day = columns.day[row]
+        if day:
+            timeline.add(day, row)
+        match_index.add(columns.game[row], columns.team1[row], columns.team2[row], row)
+
+    def append_match(self, fields):
+        row = self.columns.append(*fields)
+        self.index_row(self.timeline, self.match_index, self.columns, row)
+        self.ratings.record(*fields[1:])
+        self.dirty_periods.add(period_of(self.columns.day[row]))
+
+    def cascade(self, op, name, removed_teams=frozenset(), removed_games=frozenset()):
+        # Delete the matches of a team or game being removed, found through
+        # the reverse index so the cost is the number of those matches
+        if op == 'del_team':
+            team = self.columns.teams.get(name)
+            rows = self.match_index.team_rows(team) if team is not None else ()
+            removed_teams = removed_teams | {name}
+        else:
+            game = self.columns.games.get(name)
+            rows = self.match_index.game_rows(game) if game is not None else ()
+            removed_games = removed_games | {name}
+        if rows:
+            self.delete_rows(list(rows), removed_teams, removed_games)
+
+    def delete_rows(self, rows, removed_teams, removed_games):
+        # Tombstone live rows and take them back out of scores and indexes.
+        # The scores of the teams and games being removed were already
+        # dropped by apply(); if one has been added again since (the
+        # cascade waited for the history), what it has now is left alone.
+        self.views.clear()
+        self.revision += 1
+        columns = self.columns
+        teams, games = columns.teams.names, columns.games.names
+        for row in rows:
+            game = games[columns.game[row]]
+            team1, team2, winner = teams[columns.team1[row]], teams[columns.team2[row]], teams[columns.winner[row]]
+            period = period_of(columns.day[row])
+            self.dirty_periods.add(period)
+            if winner in (team1, team2) and winner in self.teams_table and winner not in removed_teams:
+                self.teams_table[winner] -= 1
+            if game not in self.games_table or game in removed_games:
+                continue
+            for team in (team1, team2):
+                if team not in removed_teams:
+                    self.game_scores.discard(game, team, team == winner)
+                    self.period_scores.discard(period, game, team, team == winner)
+        self.timeline.remove([(columns.day[row], row) for row in rows if columns.day[row]])
+        self.match_index.remove_rows(rows, columns)
+        self.tombstones.add(rows)
+        self.ratings_stale = True
+
+    def live_values(self):
+        # The match log minus deleted rows, copied for a checkpoint
+        columns = self.columns.copy()
+        if not self.tombstones:
+            return columns.iter_values()
+        deleted = set(self.tombstones.rows)
+        return (columns.values(row) for row in range(len(columns)) if row not in deleted)
+
+    def segments(self, periods):
+        # {period: (match rows, summary rows)} of the given months for a
+        # checkpoint, each month in recording order.  Rows never change
+        # once appended, so the checkpoint can read them while matches are
+        # being recorded.
+        columns = self.columns
+        segments = {}
+        for period in periods:
+            if period == UNDATED:
+                rows = [row for row in sorted(columns.odd_dates) if row not in self.tombstones]
+            else:
+                rows = sorted(self.timeline.between(*period_range(period)))
+            segments[period] = ((columns.values(row) for row in rows), self.period_scores.rows(period))
+        return segments
+
+    def pending_segments(self, periods):
+        # segments() before the history is loaded: each month's segment as
+        # of load() followed by its pending matches, or None if the history
+        # read has taken the segment files meanwhile
+        matches = {}
+        for op, fields in self.pending:
+            matches.setdefault(period_of(date_ordinal(fields[0])), []).append(fields)
+        segments = {}
+        for period in periods:
+            rows = self.store.read_segment(period)
+            if rows is None:
+                return None
+            segments[period] = (rows + matches.get(period, []), self.period_scores.rows(period))
+        return segments
+
+    def by_date(self, rows):
+        # Rows (in recording order) sorted by date, stable for ties
+        return sorted(rows, key=self.columns.day.__getitem__)
+
+    def index_scores(self, match_date, game, team1, team2, winner):
+        if game not in self.games_table:
+            return
+        period = period_of(date_ordinal(match_date))
+        for team in [team1, team2]:
+            if team in self.teams_table:
+                self.game_scores.add(game, team, team == winner)
+                self.period_scores.add(period, game, team, team == winner)
+
+    def apply(self, op, fields):
+        # Apply one journalled change to the in-memory tables
+        self.views.clear()
+        self.revision += 1
+        if op == 'team':
+            self.teams_table[fields[0]] = int(fields[1])
+        elif op in ('del_team', 'del_game'):
+            # One journal entry; its matches are deleted again on replay
+            if op == 'del_team':
+                self.teams_table.pop(fields[0], None)
+                self.game_scores.remove_team(fields[0])
+                self.period_scores.remove_team(fields[0])
+            else:
+                self.games_table.pop(fields[0], None)
+                self.game_scores.remove_game(fields[0])
+                self.period_scores.remove_game(fields[0])
+            if self.history_ready:
+                self.cascade(op, fields[0])
+            else:
+                self.pending.append((op, tuple(fields)))
+                self.pending_removals += 1
+        elif op == 'game':
+            self.games_table[fields[0]] = []
+        elif op == 'match':
+            match_date, game, team1, team2, winner = fields
+            if self.history_ready:
+                self.append_match(fields)
+            else:
+                self.pending.append((op, tuple(fields)))
+                self.dirty_periods.add(period_of(date_ordinal(match_date)))
+            self.index_scores(*fields)
+
+            # Update team scores
+            if winner == team1 and team1 in self.teams_table:
+                self.teams_table[team1] += 1
+            elif winner == team2 and team2 in self.teams_table:
+                self.teams_table[team2] += 1
+
+    def record(self, op, *fields):
+        # Apply a change now; flush() appends it to the journal instead of
+        # rewriting every CSV file
+        with self.lock:
+            self.apply(op, fields)
+            self.unflushed.append((op, fields))
+
+        if self.autoflush:
+            self.flush()
+
+    def settle_removals(self):
+        # The points and scores a removal takes away depend on the matches
+        # it deletes, so until the history is read a removal leaves them
+        # too high.  Score queries read it first when one is waiting.
+        if self.pending_removals:
+            self.load_history()
+
+    def teams(self):
+        self.settle_removals()
+        return list(self.teams_table.items())
+
+    def team_names(self):
+        return list(self.teams_table)
+
+    def has_team(self, name):
+        return name in self.teams_table
+
+    def add_team(self, name, score=0):
+        self.record('team', name, score)
+
+    def remove_team(self, name):
+        self.record('del_team', name)
+
+    def games(self):
+        return list(self.games_table)
+
+    def has_game(self, title):
+        return title in self.games_table
+
+    def add_game(self, title):
+        self.record('game', title)
+
+    def remove_game(self, title):
+        self.record('del_game', title)
+
+    def add_match(self, match_date, game, team1, team2, winner):
+        self.record('match', match_date, game, team1, team2, winner)
+
+    def add_matches(self, matches):
+        # Team scores and indexes are updated in the same pass
+        with self.lock:
+            for match in matches:
+                self.apply('match', match)
+                self.unflushed.append(('match', match))
+
+        if self.autoflush:
+            self.flush()
+
+    # Queries over the match log load the history on first use
+
+    def match_count(self):
+        self.load_history()
+        return len(self.columns) - len(self.tombstones)
+
+    def matches(self, start, stop):
+        self.load_history()
+        positions = range(len(self.columns) - len(self.tombstones))[start:stop]
+        if not self.tombstones:
+            return self.columns.matches(positions)
+        return self.columns.matches([self.tombstones.row(position) for position in positions])
+
+    def last_matches(self, count):
+        with self.lock:
+            if not self.history_ready:
+                matches = self.recent_segment_matches(count)
+                if matches is not None:
+                    return matches
+        self.load_history()
+        return self.columns.matches(self.timeline.latest(count))
+
+    def matches_between(self, start, end):
+        start, end = parse_date(start), parse_date(end)
+        with self.lock:
+            if not self.history_ready:
+                matches = self.segment_matches_between(start.toordinal(), end.toordinal())
+                if matches is not None:
+                    return matches
+        self.load_history()
+        return self.columns.matches(self.timeline.between(start, end))
+
+    # Before the history is loaded, date queries read only the segments of
+    # the months they cover.  Every segment row was checkpointed before
+    # the pending changes, so a pending removal drops the segment rows of
+    # its team or game, and the pending matches recorded before it.
+
+    def pending_view(self):
+        # (keep(row) for segment rows, pending match rows still alive)
+        removed_teams, removed_games = set(), set()
+        matches = []
+        for op, fields in reversed(self.pending):
+            if op == 'del_team':
+                removed_teams.add(fields[0])
+            elif op == 'del_game':
+                removed_games.add(fields[0])
+            elif not (fields[1] in removed_games or fields[2] in removed_teams or fields[3] in removed_teams):
+                matches.append(fields)
+        matches.reverse()
+
+        def keep(row):
+            return not (row[1] in removed_games or row[2] in removed_teams or row[3] in removed_teams)
+
+        return keep, matches
+
+    def recent_segment_matches(self, count):
+        # Months hold disjoint date ranges, so once the newest months
+        # read hold `count` live matches the older ones cannot matter
+        periods = self.store.segment_periods()
+        if periods is None:
+            return None
+        if count <= 0:
+            return []
+        keep, pending = self.pending_view()
+        months = []
+        found = 0
+        for period in reversed([period for period in periods if period != UNDATED]):
+            if found >= count:
+                break
+            rows = self.store.read_segment(period)
+            if rows is None:
+                return None
+            rows = [(date_ordinal(row[0]), row) for row in rows if keep(row)]
+            months.append(rows)
+            found += len(rows)
+        dated = [entry for rows in reversed(months) for entry in rows]
+        dated += [(day, row) for day, row in ((date_ordinal(row[0]), row) for row in pending) if day]
+        dated.sort(key=lambda entry: entry[0])
+        return [match_dict(day, row) for day, row in dated[:-count - 1:-1]]
+
+    def segment_matches_between(self, first, last):
+        periods = self.store.segment_periods()
+        if periods is None:
+            return None
+        low, high = period_of(first), period_of(last)
+        keep, pending = self.pending_view()
+        dated = []
+        for period in periods:
+            if period == UNDATED or not low <= period <= high:
+                continue
+            rows = self.store.read_segment(period)
+            if rows is None:
+                return None
+            dated += [(date_ordinal(row[0]), row) for row in rows if keep(row)]
+        dated += [(date_ordinal(row[0]), row) for row in pending]
+        dated = [(day, row) for day, row in dated if first <= day <= last]
+        dated.sort(key=lambda entry: entry[0])
+        return [match_dict(day, row) for day, row in dated]
+
+    def team_matches(self, team):
+        # Removed teams have no history; cost is the team's match count
+        self.load_history()
+        team_id = self.columns.teams.get(team)
+        if team_id is None or team not in self.teams_table:
+            return []
+        return self.columns.matches(self.by_date(self.match_index.team_rows(team_id)))
+
+    def pair_matches(self, team1, team2):
+        self.load_history()
+        ids = self.columns.teams.ids
+        if team1 not in self.teams_table or team2 not in self.teams_table or team1 not in ids or team2 not in ids:
+            return []
+        return self.columns.matches(self.by_date(self.match_index.pair_rows(ids[team1], ids[team2])))
+
+    # Scoreboards are sorted once and kept until the next change; callers
+    # must not modify the lists returned
+
+    def view(self, key, build):
+        with self.lock:
+            rows = self.views.get(key)
+            if rows is None:
+                rows = self.views[key] = build()
+            return rows
+
+    def overall_scoreboard(self):
+        self.settle_removals()
+        return self.view('overall', lambda: sorted(self.teams_table.items(), key=lambda x: x[1], reverse=True))
+
+    def standings(self):
+        self.settle_removals()
+
+        def build():
+            totals = self.game_scores.totals
+            return [(team, score, *totals.get(team, (0, 0))) for team, score in self.overall_scoreboard()]
+        return self.view('standings', build)
+
+    def scored_games(self):
+        self.settle_removals()
+        return self.game_scores.games()
+
+    def game_scoreboard(self, game):
+        self.settle_removals()
+        return self.view(('game', game), lambda: self.game_scores.scoreboard(game))
+
+    # Month summaries are read from the files of the last checkpoint on
+    # first use; refreshing first reloads if another process has
+    # checkpointed since, so they match the journal replayed at load
+
+    def periods(self):
+        self.refresh()
+        self.settle_removals()
+        with self.lock:
+            return self.period_scores.keys()
+
+    def period_scoreboard(self, period, game=None):
+        # Added up from the month summaries; no match is read
+        self.refresh()
+        self.settle_removals()
+        return self.view(('period', period, game), lambda: self.period_scores.scoreboard(period, game))
+
+    def rating_book(self):
+        self.load_history()
+        with self.lock:
+            if self.ratings_stale:
+                self.ratings.replay_columns(self.columns, set(self.tombstones.rows))
+                self.ratings_stale = False
+            return self.ratings
+
+    def configure_ratings(self, k=ELO_K, glicko=False):
+        with self.lock:
+            self.ratings = RatingBook(k, glicko=glicko)
+            self.ratings_stale = self.history_ready
+
+
+def open_repository(backend='csv', directory=DATA_DIR):
+    if backend == 'csv':
+        return CSVRepository(directory)
+    if backend == 'sqlite':
+        # Imported here so the CSV backend never pays for sqlite3
+        from esr.sqlite_repository import SQLiteRepository
+        return SQLiteRepository(directory)
+    raise ValueError(f"Unknown storage backend '{backend}' (expected one of {', '.join(BACKENDS)})")
@@ -0,0 +1,379 @@
+import os
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from esr.indexes import parse_date, period_of, period_range
+from esr.ratings import ELO_K, RatingBook
+from esr.repository import CSVRepository, Repository
+from esr.storage import DATA_DIR, JOURNAL_FILE, SEGMENT_DIR
+
+DATABASE_FILE = 'esr.sqlite3'
+
+# Any of these means there is a CSV database to migrate
+CSV_FILES = ('teams.csv', 'games.csv', 'matches.csv', SEGMENT_DIR, JOURNAL_FILE)
+
+# Seconds to wait for another process's write transaction to finish
+BUSY_TIMEOUT = 30
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS teams (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    score INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    day INTEGER,
+    game TEXT NOT NULL,
+    team1 TEXT NOT NULL,
+    team2 TEXT NOT NULL,
+    winner TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS teams_by_score ON teams (score DESC, id);
+CREATE INDEX IF NOT EXISTS matches_by_day ON matches (day, id);
+CREATE INDEX IF NOT EXISTS matches_by_game ON matches (game);
+CREATE INDEX IF NOT EXISTS matches_by_team1 ON matches (team1);
+CREATE INDEX IF NOT EXISTS matches_by_team2 ON matches (team2);
+'''
+
+MATCH_COLUMNS = 'date, game, team1, team2, winner'
+
+
+def day_of(match_date):
+    # Date ordinal used for ordering and range queries; NULL if malformed
+    try:
+        return parse_date(match_date).toordinal()
+    except ValueError:
+        return None
+
+
+def match_dict(row):
+    return {
+        'date': row[0],
+        'game': row[1],
+        'team1': row[2],
+        'team2': row[3],
+        'winner': row[4]
+    }
+
+
+class SQLiteRepository(Repository):
+    """Repository backed by an indexed SQLite database.
+
+    Scoreboards, date ranges and team lookups are answered by SQL queries
+    instead of walking Python lists.  Changes run in an open transaction
+    that ``flush`` commits; the connection is shared with the persistence
+    thread under ``lock``.
+
+    Several processes may share the database.  A change takes SQLite's
+    write lock before reading anything (BEGIN IMMEDIATE), so it sees every
+    other process's committed changes; matches whose team or game has been
+    removed by then are not inserted but kept in ``conflicts``.
+    """
+
+    def __init__(self, directory=DATA_DIR):
+        self.directory = directory
+        self.path = os.path.join(directory, DATABASE_FILE)
+        self.connection = None
+        self.lock = threading.RLock()
+
+        # Ratings are computed from the matches table on first use
+        self.ratings = RatingBook()
+        self.ratings_ready = False
+        self.data_version = None
+        self.conflicts = []
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+        # First start on the SQLite backend: bring the CSV data over once.
+        # The database is built under a temporary name and only appears
+        # when complete, so a failed migration is retried on the next start.
+        if not os.path.exists(self.path):
+            self.create()
+
+        self.connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self.data_version = self.connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def create(self):
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            connection = sqlite3.connect(tmp_path)
+            try:
+                connection.executescript(SCHEMA)
+                migrate_csv(self.directory, connection)
+            finally:
+                connection.close()
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def refresh(self):
+        # data_version changes whenever another connection commits; the
+        # queries read the database, so only the ratings need redoing
+        with self.lock:
+            version = self.connection.execute('PRAGMA data_version').fetchone()[0]
+            changed = version != self.data_version
+            self.data_version = version
+            if changed:
+                self.ratings_ready = False
+                self.revision += 1
+            return changed
+
+    def flush(self):
+        with self.lock:
+            self.connection.commit()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def query(self, sql, *params):
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    @contextmanager
+    def changing(self):
+        # One change: if it fails it is rolled back, leaving earlier
+        # unflushed changes alone
+        with self.lock:
+            if not self.connection.in_transaction:
+                self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.execute('SAVEPOINT change')
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute('ROLLBACK TO change')
+                raise
+            finally:
+                self.connection.execute('RELEASE change')
+            self.revision += 1
+        if self.autoflush:
+            self.flush()
+
+    def change(self, *statements):
+        # Run (sql, params) statements as one change
+        with self.changing() as connection:
+            for sql, params in statements:
+                connection.execute(sql, params)
+
+    def take_conflicts(self):
+        with self.lock:
+            conflicts, self.conflicts = self.conflicts, []
+            return conflicts
+
+    def teams(self):
+        return self.query('SELECT name, score FROM teams ORDER BY id')
+
+    def has_team(self, name):
+        return bool(self.query('SELECT 1 FROM teams WHERE name = ?', name))
+
+    def add_team(self, name, score=0):
+        self.change(('INSERT INTO teams (name, score) VALUES (?, ?)', (name, int(score))))
+
+    def remove_team(self, name):
+        # The team's matches go with it and their winners lose the points,
+        # all in the one transaction that flush() commits
+        with self.lock:
+            self.change(
+                ('''UPDATE teams SET score = score - (
+                        SELECT COUNT(*) FROM matches
+                        WHERE (team1 = ?1 OR team2 = ?1) AND winner = teams.name)
+                    WHERE name IN (SELECT winner FROM matches
+                                   WHERE (team1 = ?1 AND winner = team2) OR (team2 = ?1 AND winner = team1))''',
+                 (name,)),
+                ('DELETE FROM matches WHERE team1 = ?1 OR team2 = ?1', (name,)),
+                ('DELETE FROM teams WHERE name = ?', (name,)))
+            self.ratings_ready = False
+
+    def games(self):
+        return [row[0] for row in self.query('SELECT name FROM games ORDER BY id')]
+
+    def has_game(self, title):
+        return bool(self.query('SELECT 1 FROM games WHERE name = ?', title))
+
+    def add_game(self, title):
+        self.change(('INSERT INTO games (name) VALUES (?)', (title,)))
+
+    def remove_game(self, title):
+        with self.lock:
+            self.change(
+                ('''UPDATE teams SET score = score - (
+                        SELECT COUNT(*) FROM matches
+                        WHERE game = ?1 AND winner = teams.name AND winner IN (team1, team2))
+                    WHERE name IN (SELECT winner FROM matches WHERE game = ?1 AND winner IN (team1, team2))''',
+                 (title,)),
+                ('DELETE FROM matches WHERE game = ?1', (title,)),
+                ('DELETE FROM games WHERE name = ?', (title,)))
+            self.ratings_ready = False
+
+    def add_match(self, match_date, game, team1, team2, winner):
+        self.add_matches([(match_date, game, team1, team2, winner)])
+
+    def add_matches(self, matches):
+        # One INSERT for all rows and one UPDATE per winning team
+        with self.changing() as connection:
+            # Checked inside the write transaction, so no other process can
+            # remove a team or game between the check and the insert
+            teams = {row[0] for row in connection.execute('SELECT name FROM teams')}
+            games = {row[0] for row in connection.execute('SELECT name FROM games')}
+            valid = []
+            for match in matches:
+                if match[1] in games and match[2] in teams and match[3] in teams:
+                    valid.append(match)
+                else:
+                    self.conflicts.append(('match', tuple(match)))
+
+            wins = Counter(winner for _, _, team1, team2, winner in valid if winner in (team1, team2))
+            connection.executemany(
+                f'INSERT INTO matches (day, {MATCH_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)',
+                ((day_of(match[0]), *match) for match in valid))
+            connection.executemany(
+                'UPDATE teams SET score = score + ? WHERE name = ?',
+                ((count, team) for team, count in wins.items()))
+            if self.ratings_ready:
+                for _, game, team1, team2, winner in valid:
+                    self.ratings.record(game, team1, team2, winner)
+
+    def match_count(self):
+        return self.query('SELECT COUNT(*) FROM matches')[0][0]
+
+    def matches(self, start, stop):
+        rows = self.query(f'SELECT {MATCH_COLUMNS} FROM matches ORDER BY id LIMIT ? OFFSET ?',
+                          max(0, stop - start), start)
+        return [match_dict(row) for row in rows]
+
+    def last_matches(self, count):
+        rows = self.query(f'SELECT {MATCH_COLUMNS} FROM matches WHERE day IS NOT NULL '
+                          'ORDER BY day DESC, id DESC LIMIT ?', max(0, count))
+        return [match_dict(row) for row in rows]
+
+    def matches_between(self, start, end):
+        rows = self.query(f'SELECT {MATCH_COLUMNS} FROM matches WHERE day BETWEEN ? AND ? ORDER BY day, id',
+                          parse_date(start).toordinal(), parse_date(end).toordinal())
+        return [match_dict(row) for row in rows]
+
+    def overall_scoreboard(self):
+        return self.query('SELECT name, score FROM teams ORDER BY score DESC, id')
+
+    def standings(self):
+        return self.query('''
+            SELECT name, score, COALESCE(wins, 0), COALESCE(played, 0) FROM teams LEFT JOIN (
+                SELECT team, SUM(won) AS wins, COUNT(*) AS played FROM (
+                    SELECT game, team1 AS team, winner = team1 AS won FROM matches
+                    UNION ALL
+                    SELECT game, team2 AS team, winner = team2 AS won FROM matches
+                )
+                WHERE game IN (SELECT name FROM games)
+                GROUP BY team
+            ) ON team = name
+            ORDER BY score DESC, id''')
+
+    def scored_games(self):
+        rows = self.query('''
+            SELECT DISTINCT game FROM matches
+            WHERE game IN (SELECT name FROM games)
+              AND (team1 IN (SELECT name FROM teams) OR team2 IN (SELECT name FROM teams))
+            ORDER BY game''')
+        return [row[0] for row in rows]
+
+    def game_scoreboard(self, game):
+        # Only teams and games that still exist are counted, as in the
+        # CSV backend's index
+        return self.query('''
+            SELECT team, SUM(won), COUNT(*) FROM (
+                SELECT id, team1 AS team, winner = team1 AS won FROM matches WHERE game = ?1
+                UNION ALL
+                SELECT id, team2 AS team, winner = team2 AS won FROM matches WHERE game = ?1
+            )
+            WHERE team IN (SELECT name FROM teams) AND ?1 IN (SELECT name FROM games)
+            GROUP BY team
+            ORDER BY SUM(won) DESC, MIN(id)''', game)
+
+    def periods(self):
+        # Distinct days come off the day index; months are worked out here
+        rows = self.query('''
+            SELECT DISTINCT day FROM matches
+            WHERE day IS NOT NULL AND game IN (SELECT name FROM games)
+              AND (team1 IN (SELECT name FROM teams) OR team2 IN (SELECT name FROM teams))''')
+        return sorted({period_of(row[0]) for row in rows})
+
+    def period_scoreboard(self, period, game=None):
+        first, last = period_range(period)
+        return self.query('''
+            SELECT team, SUM(won), COUNT(*) FROM (
+                SELECT id, game, team1 AS team, winner = team1 AS won FROM matches WHERE day BETWEEN ?1 AND ?2
+                UNION ALL
+                SELECT id, game, team2 AS team, winner = team2 AS won FROM matches WHERE day BETWEEN ?1 AND ?2
+            )
+            WHERE team IN (SELECT name FROM teams) AND game IN (SELECT name FROM games)
+              AND (?3 IS NULL OR game = ?3)
+            GROUP BY team
+            ORDER BY SUM(won) DESC, MIN(id)''', first.toordinal(), last.toordinal(), game)
+
+    def team_matches(self, team):
+        # Served by the team1/team2 indexes; removed teams have no history
+        rows = self.query(f'''
+            SELECT {MATCH_COLUMNS} FROM matches
+            WHERE (team1 = ?1 OR team2 = ?1) AND ?1 IN (SELECT name FROM teams)
+            ORDER BY day, id''', team)
+        return [match_dict(row) for row in rows]
+
+    def pair_matches(self, team1, team2):
+        rows = self.query(f'''
+            SELECT {MATCH_COLUMNS} FROM matches
+            WHERE ((team1 = ?1 AND team2 = ?2) OR (team1 = ?2 AND team2 = ?1))
+              AND ?1 IN (SELECT name FROM teams) AND ?2 IN (SELECT name FROM teams)
+            ORDER BY day, id''', team1, team2)
+        return [match_dict(row) for row in rows]
+
+    def rating_book(self):
+        with self.lock:
+            if not self.ratings_ready:
+                self.ratings.replay(self.connection.execute(
+                    'SELECT game, team1, team2, winner FROM matches ORDER BY id'))
+                self.ratings_ready = True
+            return self.ratings
+
+    def configure_ratings(self, k=ELO_K, glicko=False):
+        with self.lock:
+            self.ratings = RatingBook(k, glicko=glicko)
+            self.ratings_ready = False
+
+
+def migrate_csv(directory, connection):
+    # Copy teams, games and matches (including the journal) from the CSV
+    # files in `directory` into the SQLite database on `connection`.  The
+    # CSV files are only read: no rebuild is saved and no checkpoint taken.
+    if not any(os.path.exists(os.path.join(directory, name)) for name in CSV_FILES):
+        return 0
+    source = CSVRepository(directory)
+    source.read_only = True
+    source.autoflush = False
+    source.load()
+    source.load_history()
+    source.close()
+
+    with connection:
+        connection.executemany(
+            'INSERT OR REPLACE INTO teams (name, score) VALUES (?, ?)', source.teams())
+        connection.executemany(
+            'INSERT OR IGNORE INTO games (name) VALUES (?)', ([game] for game in source.games()))
+        connection.executemany(
+            f'INSERT INTO matches (day, {MATCH_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)',
+            ((day_of(values[0]), *values) for values in source.live_values()))
+
+    return source.match_count()
+
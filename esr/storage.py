@@ -0,0 +1,647 @@
+import csv
+import io
+import os
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DATA_DIR = 'database'
+JOURNAL_FILE = 'journal.log'
+CHECKPOINT_MARKER = 'checkpoint.pending'
+LOCK_FILE = 'esr.lock'
+SEGMENT_DIR = 'matches'
+SUMMARY_SUFFIX = '.summary.csv'
+CHECKSUM_FILE = 'checksums.csv'
+
+# Number of journal entries after which the base CSV files are rewritten
+CHECKPOINT_EVERY = 500
+
+
+def fsync_dir(directory):
+    # Make renames inside the directory durable (not supported on Windows)
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_rows(path, rows):
+    # Write rows to a CSV file and force them to disk
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerows(rows)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def fingerprint(path):
+    # (size, modification time in ns, CRC-32) of a file
+    with open(path, 'rb') as file:
+        crc = zlib.crc32(file.read())
+    info = os.stat(path)
+    return info.st_size, info.st_mtime_ns, crc
+
+
+def read_rows(path):
+    try:
+        with open(path, 'r', newline='') as file:
+            return list(csv.reader(file))
+    except FileNotFoundError:
+        return []
+
+
+class DirectoryLock:
+    """Exclusive lock on a database directory shared by several processes.
+
+    Held while the journal is read for loading, appended to or
+    checkpointed, so no process sees another's half-written entries or
+    files.  Re-entrant within a process.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, LOCK_FILE)
+        self.file = None
+        self.depth = 0
+        self.guard = threading.RLock()
+
+    def acquire(self, blocking=True):
+        if not self.guard.acquire(blocking):
+            return False
+        if self.depth == 0:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                self.file = open(self.path, 'a+')
+                if not self.lock_file(blocking):
+                    self.file.close()
+                    self.file = None
+                    self.guard.release()
+                    return False
+            except BaseException:
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                self.guard.release()
+                raise
+        self.depth += 1
+        return True
+
+    def lock_file(self, blocking):
+        fd = self.file.fileno()
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            return True
+
+        # msvcrt.LK_LOCK itself gives up after about ten seconds
+        self.file.seek(0)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if blocking:
+                raise
+            return False
+        return True
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            self.file.close()
+            self.file = None
+        self.guard.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class MatchJournal:
+    """Append-only log of the changes made since the last checkpoint.
+
+    Every entry is one CSV line ``seq,op,field...`` that is flushed and
+    fsync'd before ``append`` returns.  A line torn by a crash is dropped
+    (and truncated away) the next time the journal is opened.
+
+    ``tail`` reads entries appended by another process since the journal
+    was last read or written here; ``offset`` and ``identity`` (device and
+    inode) tell it where that was and whether the file was replaced.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.last_seq = 0
+        self.entries = 0
+        self.file = None
+        self.offset = 0
+        self.identity = None
+
+    def stat(self):
+        try:
+            info = os.stat(self.path)
+        except FileNotFoundError:
+            return None, 0
+        return (info.st_dev, info.st_ino), info.st_size
+
+    def parse(self, data):
+        # (seq, op, fields) of the complete entries in `data`, and the
+        # number of bytes they take.  An entry may span several lines (a
+        # quoted field with a newline); it is complete at a newline outside
+        # quotes, which csv.writer's doubled quotes make a matter of parity.
+        # An incomplete or unreadable last entry is left out as torn; an
+        # unreadable entry followed by others means the journal is damaged.
+        entries = []
+        offset = 0
+        position = 0
+        quotes = 0
+        while True:
+            end = data.find(b'\n', position)
+            if end < 0:
+                break
+            quotes += data.count(b'"', position, end)
+            position = end + 1
+            if quotes % 2:
+                continue
+            entry = self.parse_entry(data[offset:position])
+            if entry is None:
+                if data.find(b'\n', position) >= 0:
+                    raise ValueError(f"{self.path}: unreadable entry at byte {offset}")
+                break
+            entries.append(entry)
+            offset = position
+            quotes = 0
+        return entries, offset
+
+    def parse_entry(self, line):
+        try:
+            rows = list(csv.reader(io.StringIO(line.decode('utf-8'), newline='')))
+            seq, op = int(rows[0][0]), rows[0][1]
+        except (UnicodeDecodeError, csv.Error, IndexError, ValueError):
+            return None
+        if len(rows) != 1:
+            return None
+        return seq, op, rows[0][2:]
+
+    def replay(self):
+        # Return the (seq, op, fields) entries of the journal in order
+        try:
+            with open(self.path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            data = b''
+
+        # Anything after the last complete entry was torn by a crash
+        entries, offset = self.parse(data)
+
+        if offset != len(data):
+            with open(self.path, 'r+b') as file:
+                file.truncate(offset)
+                file.flush()
+                os.fsync(file.fileno())
+
+        # Numbering starts over once a checkpoint has emptied the journal
+        self.last_seq = entries[-1][0] if entries else 0
+        self.entries = len(entries)
+        self.identity = self.stat()[0]
+        self.offset = offset
+        return entries
+
+    def tail(self):
+        # New (seq, op, fields) entries written by another process, or None
+        # if the journal was rewritten (a checkpoint) since we last read it.
+        # A line still being written is left for the next call.
+        identity, size = self.stat()
+        if identity is None or size == self.offset and identity == self.identity:
+            return []
+        if self.identity is not None and identity != self.identity or size < self.offset:
+            return None
+
+        with open(self.path, 'rb') as file:
+            file.seek(self.offset)
+            data = file.read(size - self.offset)
+        entries, consumed = self.parse(data)
+
+        self.identity = identity
+        self.offset += consumed
+        if entries:
+            self.last_seq = entries[-1][0]
+            self.entries += len(entries)
+        return entries
+
+    def append(self, op, *fields):
+        return self.append_many([(op, fields)])
+
+    def append_many(self, entries):
+        # Write (op, fields) entries with a single fsync (group commit)
+        if self.file is None:
+            self.file = open(self.path, 'a', newline='', encoding='utf-8')
+
+        lines = io.StringIO()
+        writer = csv.writer(lines, lineterminator='\n')
+        seq = self.last_seq
+        for op, fields in entries:
+            seq += 1
+            writer.writerow([seq, op, *fields])
+
+        offset = self.file.tell()
+        try:
+            self.file.write(lines.getvalue())
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError:
+            # Leave no partial batch behind; the caller may retry it
+            self.close()
+            with open(self.path, 'r+b') as file:
+                file.truncate(offset)
+            raise
+        self.last_seq = seq
+        self.entries += len(entries)
+        self.offset = self.file.tell()
+        self.identity = self.stat()[0]
+        return self.last_seq
+
+    def reset(self, after_seq):
+        # Drop every entry already covered by a checkpoint
+        remaining = [entry for entry in self.replay() if entry[0] > after_seq]
+        self.close()
+
+        tmp_path = self.path + '.tmp'
+        write_rows(tmp_path, ([seq, op, *fields] for seq, op, fields in remaining))
+        os.replace(tmp_path, self.path)
+        fsync_dir(os.path.dirname(self.path) or '.')
+        self.entries = len(remaining)
+        self.identity, self.offset = self.stat()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class CSVStore:
+    """teams.csv/games.csv and the match segments plus a write-ahead journal.
+
+    Matches are partitioned by month into ``matches/YYYY-MM.csv`` segments
+    (``matches/undated.csv`` for dates that do not parse), each with a
+    ``YYYY-MM.summary.csv`` of the wins and appearances per game and team
+    in it.  A checkpoint only rewrites the segments that changed, which in
+    normal use is just the current month.  A single matches.csv written
+    before segments existed is still read, and split by the next
+    checkpoint.
+
+    game_scores.csv is a snapshot of the per-game score index taken at the
+    same checkpoint, so the scoreboards are available without reading the
+    match history.  checksums.csv, written in the same commit, records the
+    size, modification time and CRC-32 of every file the checkpoint left
+    behind; ``load`` only trusts the snapshots if the files still match
+    it, and otherwise has them rebuilt from the match log.
+
+    Several processes may share the directory: ``lock`` must be held around
+    ``log`` and ``checkpoint`` (``load`` takes it itself), and ``changes``
+    returns what the others journalled in the meantime.
+
+    Changes are appended to the journal; the base files are only rewritten
+    by ``checkpoint``.  A checkpoint first writes ``*.tmp`` files, then
+    commits them by writing a marker holding the last journal sequence
+    number it covers.  ``load`` rolls an interrupted checkpoint forward if
+    the marker exists and discards the temporary files otherwise, so the
+    base files plus the journal always describe the latest state.
+    """
+
+    BASE_FILES = ('teams.csv', 'games.csv', 'game_scores.csv', 'matches.csv', CHECKSUM_FILE)
+    SNAPSHOT_FILES = ('teams.csv', 'games.csv', 'game_scores.csv')
+
+    def __init__(self, directory=DATA_DIR, checkpoint_every=CHECKPOINT_EVERY):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self.journal = MatchJournal(self.path(JOURNAL_FILE))
+        self.lock = DirectoryLock(directory)
+
+        # Match files opened by load(): the old single matches.csv, until
+        # read_matches takes it, and {period: segment file}, until the
+        # history is attached
+        self.matches_file = None
+        self.segment_files = None
+        self.segments_lock = threading.Lock()
+        self.legacy = False
+        # read_matches calls in progress on those files
+        self.reading = 0
+
+        # {file name: (size, mtime_ns, crc)} as of the last checkpoint, if
+        # the files on disk matched it at load
+        self.checksums = {}
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def segment_path(self, name):
+        return os.path.join(self.directory, SEGMENT_DIR, name)
+
+    def periods(self):
+        # Months that have a segment file on disk, oldest first
+        try:
+            names = os.listdir(self.path(SEGMENT_DIR))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-4] for name in names if name.endswith('.csv') and not name.endswith(SUMMARY_SUFFIX))
+
+    def snapshot_names(self, periods):
+        # Files a checkpoint leaves behind, relative to the directory
+        names = list(self.SNAPSHOT_FILES)
+        for period in periods:
+            names += [SEGMENT_DIR + '/' + period + '.csv', SEGMENT_DIR + '/' + period + SUMMARY_SUFFIX]
+        return names
+
+    def read_checksums(self):
+        return {row[0]: (int(row[1]), int(row[2]), int(row[3])) for row in read_rows(self.path(CHECKSUM_FILE))}
+
+    def verify(self, checksums):
+        # True if the files on disk are the ones described by `checksums`.
+        # Usually a stat per file; only a file whose modification time
+        # changed (copied, touched) is read to compare its CRC.
+        if set(checksums) != set(self.snapshot_names(self.periods())):
+            return False
+        for name, (size, mtime, crc) in checksums.items():
+            try:
+                info = os.stat(self.path(name))
+            except FileNotFoundError:
+                return False
+            if info.st_size != size:
+                return False
+            if info.st_mtime_ns != mtime:
+                if fingerprint(self.path(name))[2] != crc:
+                    return False
+                checksums[name] = (size, info.st_mtime_ns, crc)
+        return True
+
+    def write_checksums(self):
+        # Describe the files now on disk, for tools that write a database
+        # directory without a checkpoint
+        write_rows(self.path(CHECKSUM_FILE), ((name, *fingerprint(self.path(name)))
+                                              for name in self.snapshot_names(self.periods())))
+
+    def tmp_files(self):
+        # The *.tmp files of an unfinished checkpoint
+        paths = [self.path(name) + '.tmp' for name in self.BASE_FILES]
+        try:
+            paths += [self.segment_path(name) for name in os.listdir(self.path(SEGMENT_DIR)) if name.endswith('.tmp')]
+        except FileNotFoundError:
+            pass
+        return [path for path in paths if os.path.exists(path)]
+
+    def commit_files(self):
+        for tmp_path in self.tmp_files():
+            os.replace(tmp_path, tmp_path[:-4])
+        fsync_dir(self.directory)
+        fsync_dir(self.path(SEGMENT_DIR))
+        self.remove_empty()
+
+    def remove_empty(self):
+        # Segments emptied by removals with their summaries, and the old
+        # matches.csv once split; an empty file reads the same as a
+        # missing one
+        paths = [self.path('matches.csv')]
+        for period in self.periods():
+            path = self.segment_path(period + '.csv')
+            if os.path.getsize(path) == 0:
+                paths += [path, self.segment_path(period + SUMMARY_SUFFIX)]
+        for path in paths:
+            if os.path.exists(path) and os.path.getsize(path) == 0:
+                os.remove(path)
+
+    def recover(self):
+        marker = self.path(CHECKPOINT_MARKER)
+        try:
+            with open(marker, 'r') as file:
+                committed_seq = int(file.read().strip() or 0)
+        except FileNotFoundError:
+            committed_seq = None
+
+        if committed_seq is None:
+            for tmp_path in self.tmp_files():
+                os.remove(tmp_path)
+        else:
+            self.commit_files()
+            self.journal.reset(committed_seq)
+            os.remove(marker)
+
+    def load(self):
+        # Return teams, games, the per-game score rows and the months with
+        # a segment as of the last checkpoint (both None if not written yet
+        # or not matching checksums.csv), and the journal entries recorded
+        # after it.  Matches and month summaries are read separately.
+        if not os.path.isdir(self.directory):
+            return {}, {}, [], {}, []
+        with self.lock:
+            return self.load_files()
+
+    def load_files(self):
+        self.recover()
+
+        # Opened now so that the history read later matches this snapshot
+        self.close_segments()
+        legacy_path = self.path('matches.csv')
+        self.legacy = os.path.exists(legacy_path) and os.path.getsize(legacy_path) > 0
+        with self.segments_lock:
+            if self.legacy:
+                self.matches_file = open(legacy_path, 'r', newline='')
+            self.segment_files = {period: open(self.segment_path(period + '.csv'), 'r', newline='')
+                                  for period in self.periods()}
+
+        teams = {row[0]: int(row[1]) for row in read_rows(self.path('teams.csv'))}
+        games = {row[0]: [] for row in read_rows(self.path('games.csv'))}
+
+        checksums = self.read_checksums()
+        self.checksums = checksums if not self.legacy and self.verify(checksums) else {}
+
+        game_scores = periods = None
+        if self.checksums:
+            game_scores = [(row[0], row[1], int(row[2]), int(row[3]))
+                           for row in read_rows(self.path('game_scores.csv'))]
+            # Summaries are read by read_summary when needed
+            periods = sorted(self.segment_files)
+
+        entries = [(op, fields) for _, op, fields in self.journal.replay()]
+        return teams, games, game_scores, periods, entries
+
+    def read_summary(self, period):
+        # (game, team, wins, appearances) rows of one month's summary
+        return [(row[0], row[1], int(row[2]), int(row[3]))
+                for row in read_rows(self.segment_path(period + SUMMARY_SUFFIX))]
+
+    def segment_periods(self):
+        # Months whose segment read_segment can still read, or None once
+        # the segment files are closed (the history has been attached)
+        with self.segments_lock:
+            return None if self.segment_files is None else sorted(self.segment_files)
+
+    def read_segment(self, period):
+        # Rows of one month as of the last load(), or None once the
+        # segment files are closed
+        with self.segments_lock:
+            if self.segment_files is None:
+                return None
+            file = self.segment_files.get(period)
+            if file is None:
+                return []
+            file.seek(0)
+            return list(csv.reader(file))
+
+    def read_matches(self, progress=None):
+        # Stream the match rows (month by month) as of the last load(), even
+        # if another process has checkpointed since; progress(fraction) is
+        # called every few thousand rows.  Safe to call from a worker thread,
+        # also while read_segment serves queries from the same files: each
+        # month is read whole under `segments_lock`.  The segment files stay
+        # open until close_segments, so a second read sees the same snapshot;
+        # a load() or close() meanwhile ends the read early, its rows being
+        # out of date anyway.  Once they are closed the files on disk are read.
+        with self.segments_lock:
+            legacy, self.matches_file = self.matches_file, None
+            segments = self.segment_files
+            if segments is not None:
+                self.reading += 1
+                periods = sorted(segments)
+                size = sum(os.fstat(file.fileno()).st_size for file in segments.values())
+            else:
+                if os.path.exists(self.path('matches.csv')):
+                    legacy = open(self.path('matches.csv'), 'r', newline='')
+                periods = self.periods()
+                size = sum(os.path.getsize(self.segment_path(period + '.csv')) for period in periods)
+            if legacy is not None:
+                size += os.fstat(legacy.fileno()).st_size
+
+        consumed = 0
+        count = 0
+
+        def lines(file):
+            nonlocal consumed
+            for line in file:
+                consumed += len(line)
+                yield line
+
+        def rows(lines):
+            nonlocal count
+            for row in csv.reader(lines):
+                count += 1
+                yield row
+                if progress is not None and count % 10000 == 0:
+                    progress(min(consumed / max(size, 1), 1.0))
+
+        try:
+            if legacy is not None:
+                # The old single matches.csv may be large; it is streamed
+                with legacy:
+                    legacy.seek(0)
+                    yield from rows(lines(legacy))
+            for period in periods:
+                if segments is None:
+                    with open(self.segment_path(period + '.csv'), 'r', newline='') as file:
+                        data = file.read()
+                else:
+                    with self.segments_lock:
+                        if self.segment_files is not segments:
+                            return
+                        file = segments[period]
+                        file.seek(0)
+                        data = file.read()
+                consumed += len(data)
+                yield from rows(io.StringIO(data, newline=''))
+        finally:
+            if segments is not None:
+                with self.segments_lock:
+                    self.reading -= 1
+
+        if progress is not None:
+            progress(1.0)
+
+    def changes(self):
+        # (op, fields) entries journalled by another process since the last
+        # call, or None if it checkpointed in the meantime (reload needed)
+        entries = self.journal.tail()
+        if entries is None:
+            return None
+        return [(op, fields) for _, op, fields in entries]
+
+    def log(self, entries):
+        # Append (op, fields) entries to the journal with one fsync
+        os.makedirs(self.directory, exist_ok=True)
+        self.journal.append_many(entries)
+
+    def needs_checkpoint(self, unlogged=0):
+        return self.journal.entries + unlogged >= self.checkpoint_every
+
+    def checkpoint(self, teams, games, segments, game_scores):
+        # segments: {period: (match rows, summary rows)} for the months that
+        # changed; a month without rows loses its segment
+        os.makedirs(self.path(SEGMENT_DIR), exist_ok=True)
+
+        write_rows(self.path('teams.csv.tmp'), teams.items())
+        write_rows(self.path('games.csv.tmp'), ([game] for game in games))
+        write_rows(self.path('game_scores.csv.tmp'), game_scores)
+        for period, (matches, summary) in segments.items():
+            write_rows(self.segment_path(period + '.csv.tmp'), matches)
+            write_rows(self.segment_path(period + SUMMARY_SUFFIX + '.tmp'), summary)
+        if self.legacy:
+            # Its rows are all in the segments now; emptied in the same commit
+            write_rows(self.path('matches.csv.tmp'), [])
+
+        # Files written now are fingerprinted as temporary files (a rename
+        # keeps the modification time), the others carried over
+        checksums = dict(self.checksums)
+        written = self.snapshot_names(segments)
+        for name in written:
+            checksums[name] = fingerprint(self.path(name) + '.tmp')
+        periods = set(self.periods()) | set(segments)
+        periods.difference_update(period for period in segments
+                                  if checksums[SEGMENT_DIR + '/' + period + '.csv'][0] == 0)
+        names = self.snapshot_names(sorted(periods))
+        checksums = {name: checksums[name] if name in checksums else fingerprint(self.path(name)) for name in names}
+        write_rows(self.path(CHECKSUM_FILE + '.tmp'), ((name, *checksums[name]) for name in names))
+
+        # The marker commits the checkpoint: from here on recovery rolls forward
+        committed_seq = self.journal.last_seq
+        marker = self.path(CHECKPOINT_MARKER)
+        write_rows(marker + '.tmp', [[committed_seq]])
+        os.replace(marker + '.tmp', marker)
+        fsync_dir(self.directory)
+
+        self.commit_files()
+        self.legacy = False
+        self.checksums = checksums
+
+        self.journal.reset(committed_seq)
+        os.remove(marker)
+
+    def close_segments(self):
+        with self.segments_lock:
+            files = list(self.segment_files.values()) if self.segment_files else []
+            if self.matches_file is not None:
+                files.append(self.matches_file)
+            self.matches_file = self.segment_files = None
+        for file in files:
+            file.close()
+
+    def close(self):
+        self.journal.close()
+        self.close_segments()
@@ -0,0 +1,136 @@
+import unicodedata
+
+from esr.indexes import parse_date
+from esr.repository import open_repository
+from esr.storage import DATA_DIR
+
+FIELDS = ('date', 'game', 'team1', 'team2', 'winner')
+
+
+class ValidationError(ValueError):
+    pass
+
+
+def has_control_characters(text):
+    # Line breaks, tabs and the like make names hard to show and to type
+    return any(unicodedata.category(char) == 'Cc' for char in text)
+
+
+class Validator:
+    """Checks rows against the teams and games of a repository.
+
+    Name lookups are cached for the whole import, so each distinct team or
+    game is looked up in the repository once.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.teams = {}
+        self.games = {}
+
+    def has_team(self, name):
+        if name not in self.teams:
+            self.teams[name] = self.repository.has_team(name)
+        return self.teams[name]
+
+    def has_game(self, title):
+        if title not in self.games:
+            self.games[title] = self.repository.has_game(title)
+        return self.games[title]
+
+    def check(self, values):
+        # Normalised (date, game, team1, team2, winner), or the reason the
+        # row is rejected
+        if values is None or len(values) != len(FIELDS):
+            return None, "expected date, game, team1, team2, winner"
+
+        match_date, game, team1, team2, winner = [value.strip() for value in values]
+        try:
+            match_date = parse_date(match_date).isoformat()
+        except ValueError:
+            return None, f"invalid date '{match_date}' (expected YYYY-MM-DD)"
+        if not self.has_game(game):
+            return None, f"unknown game '{game}'"
+        for team in (team1, team2):
+            if not self.has_team(team):
+                return None, f"unknown team '{team}'"
+        if team1 == team2:
+            return None, "a team cannot play itself"
+        if winner not in (team1, team2):
+            return None, f"winner '{winner}' did not play in the match"
+        return (match_date, game, team1, team2, winner), None
+
+    def validate(self, batch):
+        valid = []
+        rejected = []
+        for line, values in batch:
+            match, reason = self.check(values)
+            if reason is None:
+                valid.append(match)
+            else:
+                rejected.append((line, values, reason))
+        return valid, rejected
+
+
+class Tracker:
+    """The results tracker without a GUI: validated changes on a repository.
+
+    Queries (scoreboards, last matches, ...) are made on ``repository``
+    directly.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    @classmethod
+    def open(cls, backend='csv', data_dir=DATA_DIR):
+        repository = open_repository(backend, data_dir)
+        repository.load()
+        return cls(repository)
+
+    def close(self):
+        self.repository.close()
+
+    def add_team(self, name, score=0):
+        name = name.strip()
+        if not name:
+            raise ValidationError("Please enter a team name.")
+        if has_control_characters(name):
+            raise ValidationError("Team names cannot contain line breaks or other control characters.")
+        if self.repository.has_team(name):
+            raise ValidationError(f"Team '{name}' already exists.")
+        self.repository.add_team(name, int(score))
+        return name
+
+    def remove_team(self, name):
+        if not self.repository.has_team(name):
+            raise ValidationError(f"Team '{name}' not found.")
+        self.repository.remove_team(name)
+
+    def add_game(self, title):
+        title = title.strip()
+        if not title:
+            raise ValidationError("Please enter a game title.")
+        if has_control_characters(title):
+            raise ValidationError("Game titles cannot contain line breaks or other control characters.")
+        if self.repository.has_game(title):
+            raise ValidationError(f"Game '{title}' already exists.")
+        self.repository.add_game(title)
+        return title
+
+    def remove_game(self, title):
+        if not self.repository.has_game(title):
+            raise ValidationError(f"Game '{title}' not found.")
+        self.repository.remove_game(title)
+
+    def record_match(self, match_date, game, team1, team2, winner):
+        # Returns the normalised (date, game, team1, team2, winner)
+        values = [match_date, game, team1, team2, winner]
+        if not all(value and value.strip() for value in values):
+            raise ValidationError("Please fill out all fields.")
+
+        match, reason = Validator(self.repository).check(values)
+        if reason is not None:
+            raise ValidationError(f"Cannot record match: {reason}.")
+        self.repository.add_match(*match)
+        return match
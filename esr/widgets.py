@@ -0,0 +1,233 @@
+import tkinter as tk
+import tkinter.ttk as ttk
+
+
+class VirtualTable(tk.Frame):
+    """A Treeview that only holds the rows currently on screen.
+
+    Rows come from two callables: ``row_count()`` and ``fetch(start, stop)``
+    returning a list of value tuples.  The widget keeps one Treeview item
+    per visible line and rewrites their values as the user scrolls, so
+    opening a table costs the same for ten rows as for a million.  Fetched
+    rows are cached in a block a few screens tall around the current
+    position.
+    """
+
+    BUFFER_SCREENS = 2
+
+    # An esr.instrumentation.Instruments to time filling in the rows with
+    instruments = None
+
+    def __init__(self, parent, columns, headings, row_count, fetch, height=240):
+        # The frame keeps its own size so that resizing the Treeview to
+        # the visible row count never feeds back into the layout
+        super().__init__(parent, height=height)
+        self.pack_propagate(False)
+
+        self.row_count = row_count
+        self.fetch = fetch
+        self.offset = 0
+        self.visible = 0
+        self.selected = None
+        self.iids = []
+        self.cache_start = 0
+        self.cache_rows = []
+
+        style = ttk.Style(self)
+        self.row_height = int(style.lookup('Treeview', 'rowheight') or 20)
+
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', height=1, selectmode='browse')
+        for column, heading in zip(columns, headings):
+            self.tree.heading(column, text=heading)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.X, expand=True, anchor='n')
+
+        self.bind('<Configure>', self.on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        self.tree.bind('<MouseWheel>', self.on_mousewheel)
+        self.tree.bind('<Button-4>', lambda event: self.scroll_by(-3))
+        self.tree.bind('<Button-5>', lambda event: self.scroll_by(3))
+        self.tree.bind('<Prior>', lambda event: self.scroll_by(-self.visible))
+        self.tree.bind('<Next>', lambda event: self.scroll_by(self.visible))
+
+    def on_resize(self, event):
+        # One row's worth of height is taken by the headings
+        visible = max(1, event.height // self.row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.tree.configure(height=visible)
+            self.render()
+
+    def on_select(self, event):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.iids:
+            self.selected = self.offset + self.iids.index(selection[0])
+
+    def on_mousewheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        step = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll_by(-step * 3)
+
+    def scroll_by(self, rows):
+        self.offset += rows
+        self.render()
+        return 'break'
+
+    def yview(self, *args):
+        # Scrollbar protocol: ('moveto', fraction) or ('scroll', n, units|pages)
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * self.row_count())
+        elif args[0] == 'scroll':
+            step = self.visible if args[2] == 'pages' else 1
+            self.offset += int(args[1]) * step
+        self.render()
+
+    def rows(self, start, stop):
+        cache_stop = self.cache_start + len(self.cache_rows)
+        if start < self.cache_start or stop > cache_stop:
+            buffer = self.visible * self.BUFFER_SCREENS
+            self.cache_start = max(0, start - buffer)
+            self.cache_rows = self.fetch(self.cache_start, stop + buffer)
+        return self.cache_rows[start - self.cache_start:stop - self.cache_start]
+
+    def render(self):
+        if self.instruments is None:
+            return self.fill()
+        with self.instruments.span('table', 'VirtualTable.render') as span:
+            span.rows = self.fill()
+
+    def fill(self):
+        # Show the rows at the current offset; returns how many
+        total = self.row_count()
+        self.offset = max(0, min(self.offset, total - self.visible))
+        rows = self.rows(self.offset, min(total, self.offset + self.visible))
+
+        # Reuse the Treeview items; only the values change when scrolling
+        while len(self.iids) > len(rows):
+            self.tree.delete(self.iids.pop())
+        while len(self.iids) < len(rows):
+            self.iids.append(self.tree.insert('', 'end'))
+        for iid, values in zip(self.iids, rows):
+            self.tree.item(iid, values=values)
+
+        if self.selected is not None and 0 <= self.selected - self.offset < len(self.iids):
+            self.tree.selection_set(self.iids[self.selected - self.offset])
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + len(rows)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        return len(rows)
+
+    def refresh(self):
+        # Drop cached rows after the underlying data changed
+        self.cache_start = 0
+        self.cache_rows = []
+        if self.selected is not None and self.selected >= self.row_count():
+            self.selected = None
+        self.render()
+
+    def selected_row(self):
+        if self.selected is None:
+            return None
+        return self.fetch(self.selected, self.selected + 1)[0]
+
+
+class LiveTable(ttk.Treeview):
+    """A Treeview that is patched in place instead of rebuilt.
+
+    ``update_rows`` compares the new rows with the ones on screen, keyed by
+    the value in column ``key``, and only inserts, moves, rewrites or
+    deletes the items that differ, so a changed score does not clear the
+    table, lose the scroll position or make it flicker.
+    """
+
+    # An esr.instrumentation.Instruments to time the updates with
+    instruments = None
+
+    def __init__(self, parent, columns, headings, key=0, **options):
+        super().__init__(parent, columns=columns, show='headings', **options)
+        for column, heading in zip(columns, headings):
+            self.heading(column, text=heading)
+        self.key = key
+        self.shown = []  # keys in display order
+        self.values = {}  # key -> row as last displayed
+
+    def update_rows(self, rows):
+        # Returns the number of items that had to be touched
+        if self.instruments is None:
+            return self.patch(rows)
+        with self.instruments.span('table', 'LiveTable.update_rows') as span:
+            span.rows = self.patch(rows)
+        return span.rows
+
+    def patch(self, rows):
+        keys = [str(row[self.key]) for row in rows]
+        wanted = set(keys)
+        touched = 0
+
+        shown = []
+        for key in self.shown:
+            if key in wanted:
+                shown.append(key)
+            else:
+                self.delete(key)
+                del self.values[key]
+                touched += 1
+
+        for position, (key, row) in enumerate(zip(keys, rows)):
+            row = tuple(row)
+            if key not in self.values:
+                self.insert('', position, iid=key, values=row)
+                shown.insert(position, key)
+                self.values[key] = row
+                touched += 1
+                continue
+            if shown[position] != key:
+                self.move(key, '', position)
+                shown.remove(key)
+                shown.insert(position, key)
+                touched += 1
+            if self.values[key] != row:
+                self.item(key, values=row)
+                self.values[key] = row
+                touched += 1
+
+        self.shown = keys
+        return touched
+
+
+class AutocompleteCombobox(ttk.Combobox):
+    """A Combobox whose list holds the names starting with what was typed.
+
+    Names come from ``search(prefix, limit)`` (a PrefixIndex); at most
+    ``LIMIT`` are put in the drop-down, so the widget is as quick with
+    thousands of names as with ten.  Down opens the list, Return takes the
+    first suggestion.
+    """
+
+    LIMIT = 50
+
+    def __init__(self, parent, search, **options):
+        super().__init__(parent, postcommand=self.update_values, **options)
+        self.search = search
+        self.bind('<KeyRelease>', self.on_key)
+        self.bind('<Return>', self.complete)
+
+    def update_values(self):
+        self['values'] = self.search(self.get(), self.LIMIT)
+
+    def on_key(self, event):
+        if event.keysym not in ('Up', 'Down', 'Return', 'Escape', 'Tab'):
+            self.update_values()
+
+    def complete(self, event=None):
+        suggestions = self.search(self.get(), 1)
+        if suggestions:
+            self.set(suggestions[0])
+            self.icursor(tk.END)
+            self.event_generate('<<ComboboxSelected>>')
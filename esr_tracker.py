@@ -1,10 +1,40 @@
-import csv
+import argparse
+import queue
+import threading
+import time
+import os
 import tkinter as tk
+import tkinter.filedialog as filedialog
+import tkinter.messagebox as messagebox
 import tkinter.ttk as ttk
-from datetime import datetime
+
+from esr.importer import iter_import
+from esr.indexes import PrefixIndex
+from esr.instrumentation import Instruments
+from esr.persistence import PersistenceWorker
+from esr.repository import BACKENDS, open_repository
+from esr.storage import DATA_DIR
+from esr.tracker import Tracker, ValidationError
+from esr.widgets import AutocompleteCombobox, LiveTable, VirtualTable
+
+# Live scoreboard: how often the database is checked for new results, and
+# the shortest time between two repaints however fast results come in
+LIVE_POLL_MS = 500
+LIVE_REPAINT_SECONDS = 2.0
+
+# How often other trackers' changes to the same database are merged in
+REFRESH_MS = 2000
+
+# Screens timed for the Diagnostics screen, each including its layout
+TIMED_VIEWS = (
+    'main_menu', 'admin_mode', 'non_admin_mode', 'wait_for_history',
+    'view_teams', 'add_team', 'remove_team', 'view_games', 'add_game', 'remove_game',
+    'view_matches', 'record_match', 'display_last_matches', 'overall_scoreboard', 'live_scoreboard',
+    'game_specific_scoreboard', 'season_scoreboard', 'ratings_leaderboard', 'team_history', 'head_to_head',
+)
 
 class ESRTracker:
-    def __init__(self):
+    def __init__(self, backend='csv', data_dir=DATA_DIR, kiosk=False):
         self.root = tk.Tk()
         self.root.title("E-Sports Results Tracker")
 
@@ -13,75 +43,203 @@ class ESRTracker:
         self.root.resizable(True, True)  # Allow resizing in both directions
         self.root.minsize(600, 400)  # Set minimum size
 
-        # Initialize dictionaries for in-memory storage
-        self.teams = {}
-        self.games = {}
-        self.matches = []
+        # All reads and writes go through the selected storage backend;
+        # changes are validated by the GUI-independent Tracker
+        self.tracker = Tracker(open_repository(backend, data_dir))
+        self.repo = self.tracker.repository
+
+        # Timings of data operations, screens and table updates, shown on
+        # the hidden Diagnostics screen (Ctrl+Shift+D)
+        self.instruments = Instruments()
+        self.instruments.instrument_repository(self.repo)
+        VirtualTable.instruments = LiveTable.instruments = self.instruments
+        for name in TIMED_VIEWS:
+            setattr(self, name, self.instruments.wrap('view', name, getattr(self, name), finish=self.view_shown))
+        self.profile_armed = False
+        self.profile_action = None
+        self.root.bind('<Control-Shift-D>', self.diagnostics)
+        self.root.bind_all('<ButtonPress-1>', self.on_click, add='+')
+        self.root.bind_all('<ButtonRelease-1>', lambda event: self.finish_profile(), add='+')
+
+        # Changes are written to disk by a background worker so that Tk
+        # callbacks never wait for the disk
+        self.repo.autoflush = False
+        self.persistence = PersistenceWorker(self.repo)
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
 
-        # Load initial data from CSV files
+        # Status line that survives clear_frame, used for background loading
+        self.status_bar = tk.Label(self.root, text="", anchor='w', fg="gray")
+        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+
+        # Load teams, games and scoreboards; the match history follows on
+        # a background thread
+        self.history_progress = 0.0
+        self.history_result = None
+        self.history_waiting = None
+        self.history_loading = False
         self.load_data()
+        self.persistence.start()
+        self.root.after(100, self.poll_persistence)
+        self.root.after(REFRESH_MS, self.poll_other_trackers)
 
-        # Create main menu
-        self.main_menu()
+        # Create main menu, or go straight to the venue screen
+        if kiosk:
+            self.root.attributes('-fullscreen', True)
+            self.root.bind('<Escape>', lambda event: self.root.attributes('-fullscreen', False))
+            self.live_scoreboard()
+        else:
+            self.main_menu()
 
     def load_data(self):
-        # Load teams from teams.csv
+        self.repo.load()
+        self.load_history_in_background()
+
+    def load_history_in_background(self):
+        if self.repo.history_loaded() or self.history_loading:
+            return
+        self.history_loading = True
+        self.history_result = None
+        self.history_progress = 0.0
+        self.status_bar.config(text="Loading match history...")
+        threading.Thread(target=self.read_history, daemon=True).start()
+        self.root.after(100, self.poll_history)
+
+    def read_history(self):
+        # Runs on the loader thread; Tk is only touched from poll_history
+        def progress(fraction):
+            self.history_progress = fraction
+
         try:
-            with open('database/teams.csv', 'r') as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    self.teams[row[0]] = int(row[1])
-        except FileNotFoundError:
-            pass
+            self.history_result = (self.repo.read_history(progress), None)
+        except Exception as error:
+            self.history_result = (None, error)
 
-        # Load games from games.csv
+    def poll_history(self):
+        if self.history_result is None:
+            percent = int(self.history_progress * 100)
+            self.status_bar.config(text=f"Loading match history... {percent}%")
+            if self.history_waiting is not None and self.history_waiting[0].winfo_exists():
+                self.history_waiting[0]['value'] = percent
+            self.root.after(100, self.poll_history)
+            return
+
+        self.history_loading = False
+        state, error = self.history_result
+        if error is not None:
+            self.status_bar.config(text=f"Could not load match history: {error}", fg="red")
+            return
+
+        self.repo.attach_history(state)
+        if not self.repo.history_loaded():
+            # Reloaded meanwhile because another tracker checkpointed
+            return self.load_history_in_background()
+        self.status_bar.config(text="")
+        self.persistence.request()  # checkpoints wait for the history
+
+        # Open the view that was waiting for the history, if still shown
+        if self.history_waiting is not None:
+            progress_bar, view = self.history_waiting
+            self.history_waiting = None
+            if progress_bar.winfo_exists():
+                view()
+
+    def wait_for_history(self, view):
+        # Show a progress screen until the match history is loaded
+        loading_frame = self.clear_frame()
+        
+        tk.Label(loading_frame, text="Loading match history...", font=('Arial', 14)).pack(pady=(100, 10))
+        progress_bar = ttk.Progressbar(loading_frame, mode='determinate', maximum=100, length=300)
+        progress_bar['value'] = int(self.history_progress * 100)
+        progress_bar.pack(pady=10)
+        
+        tk.Button(loading_frame, text="Back to Main Menu", command=self.main_menu).pack(pady=20)
+        
+        self.history_waiting = (progress_bar, view)
+
+    def scores_waiting(self):
+        # A removal takes points from other teams too, by the matches it
+        # deletes; until the history is in, screens showing scores wait
+        # for the background load instead of reading it on the Tk thread
+        return self.repo.pending_removals and not self.repo.history_loaded()
+
+    def persist(self):
+        # Queue a flush of the changes just made; bursts are coalesced
+        self.status_bar.config(text="Saving...", fg="gray")
+        self.persistence.request()
+
+    def poll_persistence(self):
+        # Report flushes finished by the worker thread
         try:
-            with open('database/games.csv', 'r') as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    self.games[row[0]] = []
-        except FileNotFoundError:
+            while True:
+                error = self.persistence.results.get_nowait()
+                if error is not None:
+                    self.status_bar.config(text=f"Could not save changes ({error}); they will be retried.", fg="red")
+                elif not self.persistence.busy():
+                    self.status_bar.config(text="All changes saved.", fg="gray")
+        except queue.Empty:
             pass
+        
+        conflicts = self.repo.take_conflicts()
+        if conflicts:
+            self.status_bar.config(text=f"{len(conflicts)} match result(s) not saved: a team or game "
+                                        "was removed by another tracker.", fg="red")
+        self.root.after(100, self.poll_persistence)
 
-        # Load matches from matches.csv
+    def poll_other_trackers(self):
+        # Merge what other trackers using the same database recorded
         try:
-            with open('database/matches.csv', 'r') as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    self.matches.append({
-                        'date': row[0],
-                        'game': row[1],
-                        'team1': row[2],
-                        'team2': row[3],
-                        'winner': row[4]
-                    })
-        except FileNotFoundError:
-            pass
+            self.repo.refresh()
+        except Exception as error:
+            self.status_bar.config(text=f"Could not read changes from other trackers: {error}", fg="red")
+        self.load_history_in_background()
+        self.root.after(REFRESH_MS, self.poll_other_trackers)
+
+    def on_close(self):
+        # Final flush before the window goes away
+        self.status_bar.config(text="Saving...", fg="gray")
+        self.root.update_idletasks()
+        self.persistence.stop()
+
+        while True:
+            try:
+                self.repo.flush()
+                break
+            except Exception as error:
+                if not messagebox.askretrycancel("E-Sports Results Tracker",
+                                                 f"Could not save changes: {error}\n\nRetry?"):
+                    break
 
-    def save_data(self):
-        # Save teams to teams.csv
-        with open('database/teams.csv', 'w', newline='') as file:
-            writer = csv.writer(file)
-            for team, score in self.teams.items():
-                writer.writerow([team, score])
-
-        # Save games to games.csv
-        with open('database/games.csv', 'w', newline='') as file:
-            writer = csv.writer(file)
-            for game, _ in self.games.items():
-                writer.writerow([game])
-
-        # Save matches to matches.csv
-        with open('database/matches.csv', 'w', newline='') as file:
-            writer = csv.writer(file)
-            for match in self.matches:
-                writer.writerow([
-                    match['date'],
-                    match['game'],
-                    match['team1'],
-                    match['team2'],
-                    match['winner']
-                ])
+        self.repo.close()
+        self.root.destroy()
+
+    def view_shown(self):
+        # Lay out the screen just built so its timing includes it
+        self.root.update_idletasks()
+        self.finish_profile()
+
+    def on_click(self, event):
+        # An armed profile covers from this press until the screen or
+        # message the click leads to is shown
+        if not self.profile_armed:
+            return
+        self.profile_armed = False
+        try:
+            self.profile_action = event.widget.cget('text') or event.widget.winfo_class()
+        except (AttributeError, tk.TclError):
+            self.profile_action = str(event.widget)
+        self.instruments.start_profile()
+
+    def finish_profile(self):
+        # Called on release and after every screen; a button that replaces
+        # the screen is destroyed before its release event gets here
+        if self.instruments.profiling():
+            self.root.after_idle(self.stop_profile)
+
+    def stop_profile(self):
+        if self.instruments.profiling():
+            self.instruments.stop_profile(self.profile_action)
+            self.status_bar.config(text=f"Profiled '{self.profile_action}'; press Ctrl+Shift+D to see it.",
+                                   fg="gray")
 
     def main_menu(self):
         main_frame = self.clear_frame()
@@ -109,6 +267,7 @@ class ESRTracker:
         
         tk.Button(admin_frame, text="View All Matches", command=self.view_matches).pack(pady=10)
         tk.Button(admin_frame, text="Record Match Result", command=self.record_match).pack(pady=10)
+        tk.Button(admin_frame, text="Import Match Results", command=self.import_matches).pack(pady=10)
         
         tk.Button(admin_frame, text="Back to Main Menu", command=self.main_menu).pack(pady=10)
 
@@ -118,14 +277,20 @@ class ESRTracker:
         non_admin_frame = tk.Frame(self.root)
         non_admin_frame.pack(fill="both", expand=True)
 
-        tk.Button(non_admin_frame, text="Display Last 5 Matches", command=self.display_last_5_matches).pack(pady=10)
+        tk.Button(non_admin_frame, text="Display Last Matches", command=self.display_last_matches).pack(pady=10)
         tk.Button(non_admin_frame, text="Overall Scoreboard", command=self.overall_scoreboard).pack(pady=10)
         tk.Button(non_admin_frame, text="Game-Specific Scoreboard", command=self.game_specific_scoreboard).pack(pady=10)
+        tk.Button(non_admin_frame, text="Season Scoreboard", command=self.season_scoreboard).pack(pady=10)
+        tk.Button(non_admin_frame, text="Live Scoreboard", command=self.live_scoreboard).pack(pady=10)
+        tk.Button(non_admin_frame, text="Ratings Leaderboard", command=self.ratings_leaderboard).pack(pady=10)
+        tk.Button(non_admin_frame, text="Team History", command=self.team_history).pack(pady=10)
+        tk.Button(non_admin_frame, text="Head-to-Head", command=self.head_to_head).pack(pady=10)
         tk.Button(non_admin_frame, text="Back to Main Menu", command=self.main_menu).pack(pady=20)
 
     def clear_frame(self):
         for widget in self.root.winfo_children():
-            widget.destroy()
+            if widget is not self.status_bar:
+                widget.destroy()
         
         # Create a new frame that expands to fill the window
         main_frame = tk.Frame(self.root)
@@ -134,20 +299,19 @@ class ESRTracker:
         return main_frame
 
     def view_teams(self, parent_frame=None):
+        if self.scores_waiting():
+            return self.wait_for_history(self.view_teams)
+        
         if parent_frame is None:
             self.clear_frame()
             parent_frame = self.root
         
         tk.Label(parent_frame, text="All Teams").pack()
         
-        tree = ttk.Treeview(parent_frame, columns=("Name", "Score"), show='headings')
-        tree.heading('Name', text='Team Name')
-        tree.heading('Score', text='Points')
-        
-        for team, score in self.teams.items():
-            tree.insert('', 'end', values=(team, score))
-        
-        tree.pack(expand=True, fill=tk.BOTH)
+        rows = self.repo.teams()
+        table = VirtualTable(parent_frame, ("Name", "Score"), ('Team Name', 'Points'),
+                             lambda: len(rows), lambda start, stop: rows[start:stop])
+        table.pack(expand=True, fill=tk.BOTH)
         
         tk.Button(parent_frame, text="Refresh", command=lambda: self.view_teams(parent_frame)).pack(pady=10)
         tk.Button(parent_frame, text="Back to Admin Menu", command=self.admin_mode).pack(pady=10)
@@ -174,19 +338,14 @@ class ESRTracker:
             team_name = team_name_entry.get().strip()
             team_score = team_score_entry.get().strip()
             
-            if team_name:
-                if team_name not in self.teams:
-                    if team_score.isdigit():
-                        self.teams[team_name] = int(team_score)
-                    else:
-                        self.teams[team_name] = 0
-                    
-                    self.save_data()
-                    result_label.config(text=f"Team '{team_name}' added successfully!", fg="green")
-                else:
-                    result_label.config(text="Team already exists!", fg="red")
-            else:
-                result_label.config(text="Please enter a team name.", fg="red")
+            try:
+                self.tracker.add_team(team_name, int(team_score) if team_score.isdigit() else 0)
+            except ValidationError as error:
+                result_label.config(text=str(error), fg="red")
+                return
+            
+            self.persist()
+            result_label.config(text=f"Team '{team_name}' added successfully!", fg="green")
         
         submit_button = tk.Button(parent_frame, text="Submit", command=submit_new_team)
         submit_button.pack()
@@ -198,34 +357,41 @@ class ESRTracker:
         cancel_button.pack(pady=10)
 
     def remove_team(self, parent_frame=None):
+        if self.scores_waiting():
+            return self.wait_for_history(self.remove_team)
+        
         if parent_frame is None:
             self.clear_frame()
             parent_frame = self.root
         
         tk.Label(parent_frame, text="Remove Team").pack()
         
-        tree = ttk.Treeview(parent_frame, columns=("Name", "Score"), show='headings')
-        tree.heading('Name', text='Team Name')
-        tree.heading('Score', text='Points')
-        
-        for team, score in self.teams.items():
-            tree.insert('', 'end', values=(team, score))
-        
-        tree.pack(expand=True, fill=tk.BOTH)
+        rows = self.repo.teams()
+        table = VirtualTable(parent_frame, ("Name", "Score"), ('Team Name', 'Points'),
+                             lambda: len(rows), lambda start, stop: rows[start:stop])
+        table.pack(expand=True, fill=tk.BOTH)
         
         def remove_selected_team():
-            selected_item = tree.selection()[0]
-            team_to_remove = tree.item(selected_item)['values'][0]
+            selected_row = table.selected_row()
+            if selected_row is None:
+                result_label.config(text="Please select a team.", fg="red")
+                return
+            team_to_remove = selected_row[0]
+            if not messagebox.askyesno("Remove Team", f"Remove '{team_to_remove}' and all of its matches?"):
+                return
+            
+            try:
+                self.tracker.remove_team(team_to_remove)
+            except ValidationError as error:
+                result_label.config(text=str(error), fg="red")
+                return
             
-            if team_to_remove in self.teams:
-                del self.teams[team_to_remove]
-                self.save_data()
-                tree.delete(*tree.get_children())
-                for team, score in self.teams.items():
-                    tree.insert('', 'end', values=(team, score))
-                result_label.config(text=f"Team '{team_to_remove}' removed successfully!", fg="green")
-            else:
-                result_label.config(text="Error: Team not found.", fg="red")
+            self.persist()
+            if self.scores_waiting():
+                return self.wait_for_history(self.remove_team)
+            rows[:] = self.repo.teams()
+            table.refresh()
+            result_label.config(text=f"Team '{team_to_remove}' and its matches removed successfully!", fg="green")
         
         remove_button = tk.Button(parent_frame, text="Remove Selected Team", command=remove_selected_team)
         remove_button.pack(pady=10)
@@ -245,7 +411,7 @@ class ESRTracker:
         tree = ttk.Treeview(parent_frame, columns=("Game"), show='headings')
         tree.heading('Game', text='Game Title')
         
-        for game in self.games.keys():
+        for game in self.repo.games():
             tree.insert('', 'end', values=(game,))
         
         tree.pack(expand=True, fill=tk.BOTH)
@@ -268,15 +434,14 @@ class ESRTracker:
         def submit_new_game():
             game_title = game_title_entry.get().strip()
             
-            if game_title:
-                if game_title not in self.games:
-                    self.games[game_title] = []
-                    self.save_data()
-                    result_label.config(text=f"Game '{game_title}' added successfully!", fg="green")
-                else:
-                    result_label.config(text="Game already exists!", fg="red")
-            else:
-                result_label.config(text="Please enter a game title.", fg="red")
+            try:
+                self.tracker.add_game(game_title)
+            except ValidationError as error:
+                result_label.config(text=str(error), fg="red")
+                return
+            
+            self.persist()
+            result_label.config(text=f"Game '{game_title}' added successfully!", fg="green")
         
         submit_button = tk.Button(parent_frame, text="Submit", command=submit_new_game)
         submit_button.pack()
@@ -296,24 +461,31 @@ class ESRTracker:
         tree = ttk.Treeview(parent_frame, columns=("Game"), show='headings')
         tree.heading('Game', text='Game Title')
         
-        for game in self.games.keys():
+        for game in self.repo.games():
             tree.insert('', 'end', values=(game,))
         
         tree.pack(expand=True, fill=tk.BOTH)
         
         def remove_selected_game():
-            selected_item = tree.selection()[0]
-            game_to_remove = tree.item(selected_item)['values'][0]
+            selection = tree.selection()
+            if not selection:
+                result_label.config(text="Please select a game.", fg="red")
+                return
+            game_to_remove = tree.item(selection[0])['values'][0]
+            if not messagebox.askyesno("Remove Game", f"Remove '{game_to_remove}' and all of its matches?"):
+                return
             
-            if game_to_remove in self.games:
-                del self.games[game_to_remove]
-                self.save_data()
-                tree.delete(*tree.get_children())
-                for game in self.games.keys():
-                    tree.insert('', 'end', values=(game,))
-                result_label.config(text=f"Game '{game_to_remove}' removed successfully!", fg="green")
-            else:
-                result_label.config(text="Error: Game not found.", fg="red")
+            try:
+                self.tracker.remove_game(game_to_remove)
+            except ValidationError as error:
+                result_label.config(text=str(error), fg="red")
+                return
+            
+            self.persist()
+            tree.delete(*tree.get_children())
+            for game in self.repo.games():
+                tree.insert('', 'end', values=(game,))
+            result_label.config(text=f"Game '{game_to_remove}' and its matches removed successfully!", fg="green")
         
         remove_button = tk.Button(parent_frame, text="Remove Selected Game", command=remove_selected_game)
         remove_button.pack(pady=10)
@@ -335,34 +507,45 @@ class ESRTracker:
         date_entry = tk.Entry(parent_frame)
         date_entry.pack()
         
-        game_label = tk.Label(parent_frame, text="Select Game:")
+        # Search-as-you-type pickers: only the names matching what has been
+        # typed are put in the drop-down, however many teams there are
+        game_index = PrefixIndex(self.repo.games())
+        team_index = PrefixIndex(self.repo.team_names())
+        
+        game_label = tk.Label(parent_frame, text="Game:")
         game_label.pack()
         game_var = tk.StringVar(parent_frame)
-        game_var.set(list(self.games.keys())[0])  # default value
-        game_option = tk.OptionMenu(parent_frame, game_var, *self.games.keys())
+        game_option = AutocompleteCombobox(parent_frame, game_index.search, textvariable=game_var)
         game_option.pack()
         
-        team1_label = tk.Label(parent_frame, text="Select Team 1:")
+        team1_label = tk.Label(parent_frame, text="Team 1:")
         team1_label.pack()
         team1_var = tk.StringVar(parent_frame)
-        team1_var.set(list(self.teams.keys())[0])  # default value
-        team1_option = tk.OptionMenu(parent_frame, team1_var, *self.teams.keys())
+        team1_option = AutocompleteCombobox(parent_frame, team_index.search, textvariable=team1_var)
         team1_option.pack()
         
-        team2_label = tk.Label(parent_frame, text="Select Team 2:")
+        team2_label = tk.Label(parent_frame, text="Team 2:")
         team2_label.pack()
         team2_var = tk.StringVar(parent_frame)
-        team2_var.set(list(self.teams.keys())[1])  # default value
-        team2_option = tk.OptionMenu(parent_frame, team2_var, *self.teams.keys())
+        team2_option = AutocompleteCombobox(parent_frame, team_index.search, textvariable=team2_var)
         team2_option.pack()
         
         winner_label = tk.Label(parent_frame, text="Select Winner:")
         winner_label.pack()
         winner_var = tk.StringVar(parent_frame)
-        winner_var.set(list(self.teams.keys())[0])  # default value
-        winner_option = tk.OptionMenu(parent_frame, winner_var, *self.teams.keys())
+        winner_option = ttk.Combobox(parent_frame, textvariable=winner_var, state='readonly')
         winner_option.pack()
         
+        def restrict_winner(*args):
+            # The winner can only be one of the two teams picked
+            choices = [team for team in (team1_var.get(), team2_var.get()) if team in team_index]
+            winner_option['values'] = choices
+            if winner_var.get() not in choices:
+                winner_var.set('')
+        
+        team1_var.trace_add('write', restrict_winner)
+        team2_var.trace_add('write', restrict_winner)
+        
         def submit_match_result():
             match_date = date_entry.get()
             game = game_var.get()
@@ -370,25 +553,14 @@ class ESRTracker:
             team2 = team2_var.get()
             winner = winner_var.get()
             
-            if match_date and game and team1 and team2 and winner:
-                self.matches.append({
-                    'date': match_date,
-                    'game': game,
-                    'team1': team1,
-                    'team2': team2,
-                    'winner': winner
-                })
-                
-                # Update team scores
-                if winner == team1:
-                    self.teams[team1] += 1
-                elif winner == team2:
-                    self.teams[team2] += 1
-                
-                self.save_data()
-                result_label.config(text=f"Match recorded successfully!", fg="green")
-            else:
-                result_label.config(text="Please fill out all fields.", fg="red")
+            try:
+                self.tracker.record_match(match_date, game, team1, team2, winner)
+            except ValidationError as error:
+                result_label.config(text=str(error), fg="red")
+                return
+            
+            self.persist()
+            result_label.config(text=f"Match recorded successfully!", fg="green")
         
         submit_button = tk.Button(parent_frame, text="Submit", command=submit_match_result)
         submit_button.pack()
@@ -398,137 +570,239 @@ class ESRTracker:
         
         tk.Button(parent_frame, text="Cancel", command=self.admin_mode).pack(pady=10)
 
+    def import_matches(self):
+        path = filedialog.askopenfilename(
+            title="Import Match Results",
+            filetypes=[("Match results", "*.csv *.json *.jsonl"), ("All files", "*.*")])
+        if not path:
+            return
+        
+        import_frame = self.clear_frame()
+        
+        tk.Label(import_frame, text=f"Importing {os.path.basename(path)}", font=('Arial', 14)).pack(pady=10)
+        progress_label = tk.Label(import_frame, text="Reading...")
+        progress_label.pack(pady=10)
+        
+        # One batch per event loop turn keeps the window responsive; the
+        # import carries on if the user navigates away
+        steps = iter_import(self.repo, path, flush=self.persist)
+        
+        def import_next_batch():
+            try:
+                report = next(steps)
+            except StopIteration:
+                if import_frame.winfo_exists():
+                    progress_label.config(fg="green")
+                    self.show_rejected_rows(import_frame, self.import_report)
+                return
+            except (OSError, ValueError) as error:
+                if import_frame.winfo_exists():
+                    progress_label.config(text=f"Import stopped: {error}", fg="red")
+                return
+            
+            self.import_report = report
+            if import_frame.winfo_exists():
+                progress_label.config(text=f"{report.read} rows read, {report.imported} imported, "
+                                           f"{len(report.rejected)} rejected")
+            self.root.after(1, import_next_batch)
+        
+        self.import_report = None
+        self.root.after(1, import_next_batch)
+        
+        tk.Button(import_frame, text="Back to Admin Menu", command=self.admin_mode).pack(side=tk.BOTTOM, pady=10)
+
+    def show_rejected_rows(self, parent_frame, report):
+        if report is None or not report.rejected:
+            return
+        
+        tk.Label(parent_frame, text="Rejected rows:").pack()
+        
+        rows = [(line, reason, ', '.join(values or [])) for line, values, reason in report.rejected]
+        table = VirtualTable(parent_frame, ("Line", "Reason", "Row"), ('Line', 'Reason', 'Row'),
+                             lambda: len(rows), lambda start, stop: rows[start:stop])
+        table.pack(expand=True, fill=tk.BOTH)
+
     def view_matches(self, parent_frame=None):
+        if not self.repo.history_loaded():
+            return self.wait_for_history(lambda: self.view_matches(parent_frame))
+        
         if parent_frame is None:
             self.clear_frame()
             parent_frame = self.root
         
         tk.Label(parent_frame, text="All Matches").pack()
         
-        tree = ttk.Treeview(parent_frame, columns=("Date", "Game", "Team1", "Team2", "Winner"), show='headings')
-        tree.heading('Date', text='Date')
-        tree.heading('Game', text='Game/Sport')
-        tree.heading('Team1', text='Team 1')
-        tree.heading('Team2', text='Team 2')
-        tree.heading('Winner', text='Winner')
-        
-        for match in self.matches:
-            tree.insert('', 'end', values=(
+        # Rows are pulled from the match log only as they scroll into view
+        def fetch_matches(start, stop):
+            return [(
                 match['date'],
                 match['game'],
                 match['team1'],
                 match['team2'],
                 match['winner']
-            ))
+            ) for match in self.repo.matches(start, stop)]
         
-        tree.pack(expand=True, fill=tk.BOTH)
+        table = VirtualTable(parent_frame, ("Date", "Game", "Team1", "Team2", "Winner"),
+                             ('Date', 'Game/Sport', 'Team 1', 'Team 2', 'Winner'),
+                             self.repo.match_count, fetch_matches)
+        table.pack(expand=True, fill=tk.BOTH)
         
         tk.Button(parent_frame, text="Refresh", command=lambda: self.view_matches(parent_frame)).pack(pady=10)
         tk.Button(parent_frame, text="Back to Admin Menu", command=self.admin_mode).pack(pady=10)
 
-    def display_last_5_matches(self):
+    def display_last_matches(self, count=5):
+        # Served from the newest month segments until the history is in
         self.clear_frame()  # Clear the current frame
         
-        last_5_matches_frame = tk.Frame(self.root)
-        last_5_matches_frame.pack(fill="both", expand=True)
+        last_matches_frame = tk.Frame(self.root)
+        last_matches_frame.pack(fill="both", expand=True)
 
-        # Sort matches by date in descending order
-        sorted_matches = sorted(self.matches, key=lambda x: datetime.strptime(x['date'], '%Y-%m-%d'), reverse=True)
-        
-        # Display only the last 5 matches
-        last_5_matches = sorted_matches[:5]
+        count_frame = tk.Frame(last_matches_frame)
+        count_frame.pack(pady=10)
+        tk.Label(count_frame, text="Number of matches:").pack(side=tk.LEFT)
+        count_entry = tk.Entry(count_frame, width=6)
+        count_entry.insert(0, str(count))
+        count_entry.pack(side=tk.LEFT, padx=5)
+
+        def show_count():
+            value = count_entry.get().strip()
+            self.display_last_matches(int(value) if value.isdigit() else count)
+
+        tk.Button(count_frame, text="Show", command=show_count).pack(side=tk.LEFT)
+
+        # Most recent matches first
+        last_matches = self.repo.last_matches(count)
         
-        if last_5_matches:
-            tk.Label(last_5_matches_frame, text="Last 5 Matches:", font=('Arial', 14)).pack(pady=10)
+        if last_matches:
+            tk.Label(last_matches_frame, text=f"Last {len(last_matches)} Matches:", font=('Arial', 14)).pack(pady=10)
             
-            for i, match in enumerate(last_5_matches, 1):
+            for i, match in enumerate(last_matches, 1):
                 match_info = f"Date: {match['date']}\n"
                 match_info += f"Game: {match['game']}\n"
                 match_info += f"Teams: {match['team1']} vs {match['team2']}\n"
                 match_info += f"Winner: {match['winner']}"
                 
-                match_frame = tk.Frame(last_5_matches_frame)
+                match_frame = tk.Frame(last_matches_frame)
                 match_frame.pack(pady=10, padx=10)
                 
                 tk.Label(match_frame, text=f"Match {i}", font=('Arial', 12, 'bold')).pack()
                 tk.Label(match_frame, text=match_info, wraplength=400, justify=tk.LEFT).pack()
         else:
-            tk.Label(last_5_matches_frame, text="No matches recorded yet.", font=('Arial', 14)).pack(pady=100)
+            tk.Label(last_matches_frame, text="No matches recorded yet.", font=('Arial', 14)).pack(pady=100)
         
-        tk.Button(last_5_matches_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=20)
+        tk.Button(last_matches_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=20)
 
     def overall_scoreboard(self):
+        if self.scores_waiting():
+            return self.wait_for_history(self.overall_scoreboard)
+        
         self.clear_frame()  # Clear the current frame
         
         scoreboard_frame = tk.Frame(self.root)
         scoreboard_frame.pack(fill="both", expand=True)
 
-        # Sort teams by score in descending order
-        sorted_teams = sorted(self.teams.items(), key=lambda x: x[1], reverse=True)
+        # Teams by score in descending order, with wins and matches played
+        sorted_teams = self.repo.standings()
         
         if sorted_teams:
             tk.Label(scoreboard_frame, text="Overall Scoreboard:", font=('Arial', 14)).pack(pady=10)
             
-            tree = ttk.Treeview(scoreboard_frame, columns=("Team", "Score"), show='headings')
-            tree.heading('Team', text='Team Name')
-            tree.heading('Score', text='Points')
-            
-            for team, score in sorted_teams:
-                tree.insert('', 'end', values=(team, score))
-            
-            tree.pack(expand=True, fill=tk.BOTH)
+            table = VirtualTable(scoreboard_frame, ("Team", "Score", "Wins", "Played"),
+                                 ('Team Name', 'Points', 'Wins', 'Played'),
+                                 lambda: len(sorted_teams), lambda start, stop: sorted_teams[start:stop])
+            table.pack(expand=True, fill=tk.BOTH)
         else:
             tk.Label(scoreboard_frame, text="No teams recorded yet.", font=('Arial', 14)).pack(pady=100)
         
         tk.Button(scoreboard_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=20)
 
+    def live_scoreboard(self):
+        # Overall scoreboard for venue screens.  Results entered anywhere
+        # (another tracker, python -m esr) show up without navigating; the
+        # table is patched row by row rather than rebuilt.
+        if self.scores_waiting():
+            return self.wait_for_history(self.live_scoreboard)
+        
+        live_frame = self.clear_frame()
+        
+        tk.Label(live_frame, text="Overall Scoreboard", font=('Arial', 24, 'bold')).pack(pady=10)
+        
+        style = ttk.Style(live_frame)
+        style.configure('Live.Treeview', font=('Arial', 16), rowheight=32)
+        style.configure('Live.Treeview.Heading', font=('Arial', 16, 'bold'))
+        table = LiveTable(live_frame, ("Rank", "Team", "Score"), ('#', 'Team Name', 'Points'), key=1,
+                          style='Live.Treeview')
+        table.pack(expand=True, fill=tk.BOTH, padx=20)
+        
+        updated_label = tk.Label(live_frame, text="", fg="gray")
+        updated_label.pack(pady=5)
+        
+        tk.Button(live_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=10)
+        
+        # Repainted when the repository's revision moves on, which also
+        # counts results merged in by poll_other_trackers or a flush
+        state = {'revision': None, 'painted': 0.0}
+        
+        def repaint():
+            state['revision'] = self.repo.revision
+            rows = [(rank, team, score) for rank, (team, score) in enumerate(self.repo.overall_scoreboard(), 1)]
+            table.update_rows(rows)
+            state['painted'] = time.monotonic()
+            updated_label.config(text=f"Updated {time.strftime('%H:%M:%S')}")
+        
+        def poll():
+            if not table.winfo_exists():
+                return
+            try:
+                self.repo.refresh()
+            except Exception as error:
+                updated_label.config(text=f"Could not read new results: {error}")
+            # A burst of results costs one repaint per LIVE_REPAINT_SECONDS;
+            # a removal merged in is shown once the history has loaded
+            if (state['revision'] != self.repo.revision and not self.scores_waiting()
+                    and time.monotonic() - state['painted'] >= LIVE_REPAINT_SECONDS):
+                repaint()
+            self.root.after(LIVE_POLL_MS, poll)
+        
+        repaint()
+        self.root.after(LIVE_POLL_MS, poll)
+
     def game_specific_scoreboard(self):
+        if self.scores_waiting():
+            return self.wait_for_history(self.game_specific_scoreboard)
+        
         self.clear_frame()  # Clear the current frame
         
         game_scoreboard_frame = tk.Frame(self.root)
         game_scoreboard_frame.pack(fill="both", expand=True)
 
-        # Get unique games from matches
-        games = set(match['game'] for match in self.matches)
+        # Games that have at least one indexed result
+        games = self.repo.scored_games()
         
         if games:
             tk.Label(game_scoreboard_frame, text="Select a Game:", font=('Arial', 12)).pack(pady=10)
             
             game_var = tk.StringVar(game_scoreboard_frame)
-            game_var.set(next(iter(games)))  # Set default value
+            game_var.set(games[0])  # Set default value
             
-            game_option = tk.OptionMenu(game_scoreboard_frame, game_var, *sorted(games))
+            game_option = tk.OptionMenu(game_scoreboard_frame, game_var, *games)
             game_option.pack(pady=10)
             
             def display_game_scoreboard():
                 selected_game = game_var.get()
+                if self.scores_waiting():
+                    return self.wait_for_history(self.game_specific_scoreboard)
                 
-                # Filter matches for the selected game
-                game_matches = [match for match in self.matches if match['game'] == selected_game]
-                
-                # Calculate scores for each team in the game
-                game_scores = {}
-                for match in game_matches:
-                    for team in [match['team1'], match['team2']]:
-                        if team not in game_scores:
-                            game_scores[team] = 0
-                        if team == match['winner']:
-                            game_scores[team] += 1
-                
-                # Sort teams by score in descending order
-                sorted_teams = sorted(game_scores.items(), key=lambda x: x[1], reverse=True)
+                # Teams sorted by wins in this game, served from the index
+                sorted_teams = self.repo.game_scoreboard(selected_game)
                 
                 if sorted_teams:
                     tk.Label(game_scoreboard_frame, text=f"{selected_game} Scoreboard:", font=('Arial', 14)).pack(pady=10)
                     
-                    tree = ttk.Treeview(game_scoreboard_frame, columns=("Team", "Score"), show='headings')
-                    tree.heading('Team', text='Team Name')
-                    tree.heading('Score', text='Points')
-                    
-                    for team, score in sorted_teams:
-                        tree.insert('', 'end', values=(team, score))
-                    
-                    tree.pack(expand=True, fill=tk.BOTH)
+                    table = VirtualTable(game_scoreboard_frame, ("Team", "Score"), ('Team Name', 'Points'),
+                                         lambda: len(sorted_teams),
+                                         lambda start, stop: [row[:2] for row in sorted_teams[start:stop]])
+                    table.pack(expand=True, fill=tk.BOTH)
                 else:
                     tk.Label(game_scoreboard_frame, text="No matches recorded for this game yet.", font=('Arial', 14)).pack(pady=100)
             
@@ -539,9 +813,229 @@ class ESRTracker:
         
         tk.Button(game_scoreboard_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=20)
 
+    def season_scoreboard(self, period=None):
+        # Wins per team in a year or a month, added up from the month
+        # summaries, so it only waits for the match history while a
+        # removal does
+        if self.scores_waiting():
+            return self.wait_for_history(lambda: self.season_scoreboard(period))
+        
+        season_frame = self.clear_frame()
+        
+        months = self.repo.periods()
+        if not months:
+            tk.Label(season_frame, text="No matches recorded yet.", font=('Arial', 14)).pack(pady=100)
+            tk.Button(season_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=20)
+            return
+        
+        # Years first, then months, newest first
+        periods = sorted({month[:4] for month in months}, reverse=True) + months[::-1]
+        period = period if period in periods else periods[0]
+        picker = ttk.Combobox(season_frame, values=periods, state='readonly')
+        picker.set(period)
+        picker.bind('<<ComboboxSelected>>', lambda event: self.season_scoreboard(picker.get()))
+        picker.pack(pady=10)
+        
+        rows = self.repo.period_scoreboard(period)
+        tk.Label(season_frame, text=f"{period} Scoreboard:", font=('Arial', 14)).pack(pady=10)
+        table = VirtualTable(season_frame, ("Team", "Wins", "Played"), ('Team Name', 'Wins', 'Played'),
+                             lambda: len(rows), lambda start, stop: rows[start:stop])
+        table.pack(expand=True, fill=tk.BOTH)
+        
+        tk.Button(season_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=20)
+
+    def ratings_leaderboard(self, game=None):
+        # Ratings are recomputed together with the match history
+        if not self.repo.history_loaded():
+            return self.wait_for_history(lambda: self.ratings_leaderboard(game))
+        
+        ratings_frame = self.clear_frame()
+        
+        tk.Label(ratings_frame, text="Ratings Leaderboard:", font=('Arial', 14)).pack(pady=10)
+        
+        all_games = "All Games"
+        game_var = tk.StringVar(ratings_frame)
+        game_var.set(game or all_games)
+        game_option = tk.OptionMenu(ratings_frame, game_var, all_games, *self.repo.games(),
+                                    command=lambda choice: self.ratings_leaderboard(None if choice == all_games else choice))
+        game_option.pack(pady=10)
+        
+        # Elo ratings, updated as each match is recorded
+        rated_teams = [(team, round(rating), played) for team, rating, played in self.repo.rating_leaderboard(game)]
+        
+        if rated_teams:
+            table = VirtualTable(ratings_frame, ("Team", "Rating", "Played"), ('Team Name', 'Elo', 'Matches'),
+                                 lambda: len(rated_teams), lambda start, stop: rated_teams[start:stop])
+            table.pack(expand=True, fill=tk.BOTH)
+        else:
+            tk.Label(ratings_frame, text="No rated matches yet.", font=('Arial', 14)).pack(pady=100)
+        
+        tk.Button(ratings_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=20)
+
+    def team_history(self, team=None):
+        if not self.repo.history_loaded():
+            return self.wait_for_history(lambda: self.team_history(team))
+        
+        history_frame = self.clear_frame()
+        
+        teams = self.repo.team_names()
+        if not teams:
+            tk.Label(history_frame, text="No teams recorded yet.", font=('Arial', 14)).pack(pady=100)
+            tk.Button(history_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=20)
+            return
+        
+        team = team if team in teams else teams[0]
+        picker = AutocompleteCombobox(history_frame, PrefixIndex(teams).search)
+        picker.set(team)
+        picker.bind('<<ComboboxSelected>>', lambda event: self.team_history(picker.get()))
+        picker.pack(pady=10)
+        
+        # Newest first, read from the per-team index
+        matches = self.repo.team_matches(team)[::-1]
+        current, longest = self.repo.win_streaks(team)
+        wins = sum(1 for match in matches if match['winner'] == team)
+        tk.Label(history_frame, text=f"{team}: {wins} wins in {len(matches)} matches", font=('Arial', 14)).pack(pady=5)
+        tk.Label(history_frame, text=f"Current win streak: {current}    Longest win streak: {longest}").pack(pady=5)
+        
+        table = VirtualTable(history_frame, ("Date", "Game", "Opponent", "Result"), ('Date', 'Game', 'Opponent', 'Result'),
+                             lambda: len(matches),
+                             lambda start, stop: [(match['date'], match['game'],
+                                                   match['team2'] if match['team1'] == team else match['team1'],
+                                                   "Won" if match['winner'] == team else "Lost")
+                                                  for match in matches[start:stop]])
+        table.pack(expand=True, fill=tk.BOTH)
+        
+        tk.Button(history_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=20)
+
+    def head_to_head(self, team1=None, team2=None):
+        if not self.repo.history_loaded():
+            return self.wait_for_history(lambda: self.head_to_head(team1, team2))
+        
+        versus_frame = self.clear_frame()
+        
+        teams = self.repo.team_names()
+        if len(teams) < 2:
+            tk.Label(versus_frame, text="At least two teams are needed.", font=('Arial', 14)).pack(pady=100)
+            tk.Button(versus_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=20)
+            return
+        
+        picker_frame = tk.Frame(versus_frame)
+        picker_frame.pack(pady=10)
+        team_index = PrefixIndex(teams)
+        team1_picker = AutocompleteCombobox(picker_frame, team_index.search)
+        team1_picker.set(team1 if team1 in teams else teams[0])
+        team2_picker = AutocompleteCombobox(picker_frame, team_index.search)
+        team2_picker.set(team2 if team2 in teams else teams[1])
+        team1_picker.pack(side=tk.LEFT)
+        tk.Label(picker_frame, text="vs").pack(side=tk.LEFT, padx=10)
+        team2_picker.pack(side=tk.LEFT)
+        tk.Button(picker_frame, text="Compare",
+                  command=lambda: self.head_to_head(team1_picker.get(), team2_picker.get())).pack(side=tk.LEFT, padx=10)
+        
+        if team1 in teams and team2 in teams:
+            # Served from the per-pair index
+            wins1, wins2, played = self.repo.head_to_head(team1, team2)
+            tk.Label(versus_frame, text=f"{team1} {wins1} - {wins2} {team2} ({played} matches)",
+                     font=('Arial', 14)).pack(pady=10)
+            
+            matches = self.repo.pair_matches(team1, team2)[::-1]
+            table = VirtualTable(versus_frame, ("Date", "Game", "Winner"), ('Date', 'Game', 'Winner'),
+                                 lambda: len(matches),
+                                 lambda start, stop: [(match['date'], match['game'], match['winner'])
+                                                      for match in matches[start:stop]])
+            table.pack(expand=True, fill=tk.BOTH)
+        
+        tk.Button(versus_frame, text="Back to Non-Admin Mode", command=self.non_admin_mode).pack(pady=20)
+
+    def diagnostics(self, event=None):
+        # Hidden admin screen: how long data operations, screens and table
+        # updates took since the start (or the last reset)
+        diagnostics_frame = self.clear_frame()
+        
+        tk.Label(diagnostics_frame, text="Diagnostics", font=('Arial', 14)).pack(pady=10)
+        
+        def ms(seconds):
+            return f"{seconds * 1000:.2f}"
+        
+        rows = [(row['kind'], row['name'], row['calls'], ms(row['p50']), ms(row['p99']), ms(row['max']),
+                 ms(row['total']), row['rows'])
+                for row in self.instruments.summary()]
+        table = VirtualTable(diagnostics_frame, ("Kind", "Operation", "Calls", "P50", "P99", "Max", "Total", "Rows"),
+                             ('Kind', 'Operation', 'Calls', 'p50 ms', 'p99 ms', 'Max ms', 'Total ms', 'Rows'),
+                             lambda: len(rows), lambda start, stop: rows[start:stop], height=180)
+        table.pack(fill=tk.X, padx=10)
+        
+        histogram_label = tk.Label(diagnostics_frame, text="Select an operation to see its histogram.",
+                                   font=('Courier', 9), justify=tk.LEFT)
+        histogram_label.pack(pady=5)
+        
+        def show_histogram(event):
+            row = table.selected_row()
+            if row is None:
+                return
+            buckets = self.instruments.histogram(row[0], row[1])
+            most = max(count for _, count in buckets) or 1
+            histogram_label.config(text='\n'.join(f"{label:>11} {'#' * round(count * 40 / most):<40} {count}"
+                                                  for label, count in buckets))
+        
+        table.tree.bind('<<TreeviewSelect>>', show_histogram, add='+')
+        
+        def export_trace():
+            path = filedialog.asksaveasfilename(
+                title="Export Trace", defaultextension='.json',
+                filetypes=[("Chrome trace", "*.json"), ("CSV", "*.csv")])
+            if not path:
+                return
+            try:
+                if path.lower().endswith('.csv'):
+                    self.instruments.export_csv(path)
+                else:
+                    self.instruments.export_json(path)
+            except OSError as error:
+                messagebox.showerror("Export Trace", f"Could not write {path}: {error}")
+        
+        def reset():
+            self.instruments.reset()
+            self.diagnostics()
+        
+        def profile_next_click():
+            # Armed once the admin menu is up, so going there is not it
+            self.admin_mode()
+            self.status_bar.config(text="The next click will be profiled.", fg="gray")
+            self.root.after_idle(lambda: setattr(self, 'profile_armed', True))
+        
+        def save_profile():
+            path = filedialog.asksaveasfilename(title="Save Profile", defaultextension='.prof',
+                                                filetypes=[("cProfile stats", "*.prof")])
+            if path:
+                self.instruments.dump_profile(path)
+        
+        buttons = tk.Frame(diagnostics_frame)
+        buttons.pack(pady=5)
+        tk.Button(buttons, text="Refresh", command=self.diagnostics).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Export Trace...", command=export_trace).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Reset", command=reset).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Profile Next Click", command=profile_next_click).pack(side=tk.LEFT, padx=5)
+        
+        report = self.instruments.profile_report()
+        if report:
+            tk.Button(buttons, text="Save Profile...", command=save_profile).pack(side=tk.LEFT, padx=5)
+            text = tk.Text(diagnostics_frame, height=8, font=('Courier', 9), wrap=tk.NONE)
+            text.insert('1.0', report)
+            text.config(state=tk.DISABLED)
+            text.pack(expand=True, fill=tk.BOTH, padx=10)
+        
+        tk.Button(diagnostics_frame, text="Back to Admin Menu", command=self.admin_mode).pack(pady=10)
+
     def run(self):
         self.root.mainloop()
 
 if __name__ == "__main__":
-    app = ESRTracker()
+    parser = argparse.ArgumentParser(description="E-Sports Results Tracker")
+    parser.add_argument('--backend', choices=BACKENDS, default='csv', help="storage backend (default: csv)")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="database directory (default: database)")
+    parser.add_argument('--kiosk', action='store_true', help="start full screen on the live scoreboard")
+    args = parser.parse_args()
+
+    app = ESRTracker(args.backend, args.data_dir, args.kiosk)
     app.run()
@@ -0,0 +1,15 @@
+import pytest
+
+from esr.repository import CSVRepository
+
+
+@pytest.fixture
+def repository_factory(tmp_path):
+    # Opens a loaded CSVRepository on the test's database directory;
+    # `directory` defaults to tmp_path.  Each call is a separate instance,
+    # as another process sharing the directory would be.
+    def opened(directory=tmp_path):
+        repository = CSVRepository(str(directory))
+        repository.load()
+        return repository
+    return opened
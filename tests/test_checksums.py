@@ -0,0 +1,102 @@
+import os
+import shutil
+
+from esr.storage import CHECKSUM_FILE, SEGMENT_DIR, fingerprint, read_rows
+
+
+def checkpointed(opened):
+    # Two months of Chess, one of Go, checkpointed; the journal is empty
+    repository = opened()
+    for team in ('Alpha', 'Beta', 'Gamma'):
+        repository.add_team(team)
+    for game in ('Chess', 'Go'):
+        repository.add_game(game)
+    repository.add_match('2024-01-05', 'Chess', 'Alpha', 'Beta', 'Alpha')
+    repository.add_match('2024-01-09', 'Chess', 'Alpha', 'Beta', 'Alpha')
+    repository.add_match('2024-02-03', 'Go', 'Gamma', 'Alpha', 'Gamma')
+    repository.save()
+    repository.close()
+
+
+def listed(directory):
+    # {name: (size, mtime_ns, crc)} from checksums.csv
+    return {row[0]: tuple(map(int, row[1:])) for row in read_rows(os.path.join(directory, CHECKSUM_FILE))}
+
+
+def wins(repository, game):
+    return {team: won for team, won, _ in repository.game_scoreboard(game)}
+
+
+def files_left(directory):
+    names = {name for name in os.listdir(directory) if name.endswith('.csv') and name != CHECKSUM_FILE}
+    names |= {SEGMENT_DIR + '/' + name for name in os.listdir(os.path.join(directory, SEGMENT_DIR))}
+    return names
+
+
+def test_a_segment_edited_by_hand_is_rebuilt(tmp_path, repository_factory):
+    checkpointed(repository_factory)
+    segment = tmp_path / SEGMENT_DIR / '2024-01.csv'
+    segment.write_text(segment.read_text().replace('Beta,Alpha', 'Beta,Beta', 1))
+
+    repository = repository_factory()
+    # Rebuilt from the match log: the history was read, the edit counts
+    assert repository.history_loaded()
+    assert wins(repository, 'Chess') == {'Alpha': 1, 'Beta': 1}
+    repository.close()
+
+    # ...and the rebuild was checkpointed, so the next load trusts it again
+    assert listed(tmp_path)[SEGMENT_DIR + '/2024-01.csv'] == fingerprint(segment)
+    repository = repository_factory()
+    assert not repository.history_loaded()
+    assert wins(repository, 'Chess') == {'Alpha': 1, 'Beta': 1}
+    repository.close()
+
+
+def test_a_copied_file_with_the_same_contents_is_trusted(tmp_path, repository_factory):
+    checkpointed(repository_factory)
+    segment = tmp_path / SEGMENT_DIR / '2024-01.csv'
+    copy = tmp_path / 'copy.csv'
+    shutil.copyfile(segment, copy)
+    os.replace(copy, segment)
+    info = os.stat(segment)
+    os.utime(segment, ns=(info.st_atime_ns, info.st_mtime_ns + 10 ** 9))
+    assert fingerprint(segment)[1] != listed(tmp_path)[SEGMENT_DIR + '/2024-01.csv'][1]
+
+    repository = repository_factory()
+    assert not repository.history_loaded()
+    assert wins(repository, 'Chess') == {'Alpha': 2, 'Beta': 0}
+    repository.close()
+
+
+def test_a_file_missing_from_checksums_means_a_rebuild(tmp_path, repository_factory):
+    checkpointed(repository_factory)
+    (tmp_path / SEGMENT_DIR / '2023-12.csv').write_text('2023-12-31,Go,Beta,Gamma,Beta\n')
+
+    repository = repository_factory()
+    assert repository.history_loaded()
+    assert repository.match_count() == 4
+    repository.close()
+
+
+def test_checksums_cover_exactly_the_files_left_behind(tmp_path, repository_factory):
+    checkpointed(repository_factory)
+    assert set(listed(tmp_path)) == files_left(tmp_path)
+
+    # Removing Go empties February: its segment and summary go, and so
+    # do their entries
+    repository = repository_factory()
+    repository.remove_game('Go')
+    repository.save()
+    repository.close()
+
+    assert not (tmp_path / SEGMENT_DIR / '2024-02.csv').exists()
+    checksums = listed(tmp_path)
+    assert set(checksums) == files_left(tmp_path)
+    assert SEGMENT_DIR + '/2024-02.summary.csv' not in checksums
+    for name, (size, _, crc) in checksums.items():
+        assert fingerprint(tmp_path / name)[::2] == (size, crc)
+
+    repository = repository_factory()
+    assert not repository.history_loaded()
+    assert repository.periods() == ['2024-01']
+    repository.close()
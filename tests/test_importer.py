@@ -0,0 +1,105 @@
+import io
+import json
+
+import pytest
+
+from esr.importer import import_matches, iter_json_array, read_results, write_rejects
+
+ITEMS = [
+    1, 2.5, -3e-2, 4E+1, 12345678901234567890, True, None, "a], b",
+    {"date": "2024-01-05", "game": "Chess", "team1": "Alpha", "team2": "Beta", "winner": "Alpha"},
+    {"nested": [1, [2, 3], {"x": "\"]"}]}, [], {}, "é€",
+]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 16, 64, 1 << 16])
+def test_json_array_items_survive_any_chunk_boundary(chunk_size):
+    for text in (json.dumps(ITEMS), json.dumps(ITEMS, indent=2), json.dumps(ITEMS, separators=(',', ':'))):
+        assert list(iter_json_array(io.StringIO(text), chunk_size)) == ITEMS
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4])
+def test_numbers_split_inside_their_fraction_or_exponent(chunk_size):
+    assert list(iter_json_array(io.StringIO('[1, 2.5]'), chunk_size)) == [1, 2.5]
+    assert list(iter_json_array(io.StringIO('[10,2.25e-3,7E+2]'), chunk_size)) == [10, 2.25e-3, 700.0]
+
+
+def test_empty_json_array():
+    assert list(iter_json_array(io.StringIO('  [ ]  '), 1)) == []
+
+
+@pytest.mark.parametrize('text, message', [
+    ('{"date": "2024-01-05"}', "expected a JSON array"),
+    ('[1 2]', "expected ',' or ']'"),
+    ('[1, 2', "expected ',' or ']'"),
+    ('[1, {"a": ]', "invalid JSON in array item 2"),
+])
+def test_malformed_json_arrays(text, message):
+    with pytest.raises(ValueError, match=message):
+        list(iter_json_array(io.StringIO(text), 3))
+
+
+def test_csv_header_row_is_skipped(tmp_path):
+    path = tmp_path / 'results.csv'
+    path.write_text('Date, Game ,team1,TEAM2,winner\n2024-01-05,Chess,Alpha,Beta,Alpha\n')
+    assert list(read_results(str(path))) == [(2, ['2024-01-05', 'Chess', 'Alpha', 'Beta', 'Alpha'])]
+
+    path.write_text('2024-01-05,Chess,Alpha,Beta,Alpha\n')
+    assert list(read_results(str(path))) == [(1, ['2024-01-05', 'Chess', 'Alpha', 'Beta', 'Alpha'])]
+
+
+def populated(repository):
+    for team in ('Alpha', 'Beta'):
+        repository.add_team(team)
+    repository.add_game('Chess')
+    return repository
+
+
+def test_rejected_rows_are_reported_with_their_line(tmp_path, repository_factory):
+    repository = populated(repository_factory(tmp_path / 'db'))
+    path = tmp_path / 'results.csv'
+    path.write_text('date,game,team1,team2,winner\n'
+                    '2024-01-05,Chess,Alpha,Beta,Alpha\n'
+                    '2024-13-05,Chess,Alpha,Beta,Alpha\n'
+                    '2024-01-06,Go,Alpha,Beta,Alpha\n'
+                    '2024-01-06,Chess,Alpha,Gamma,Alpha\n'
+                    '2024-01-06,Chess,Alpha,Alpha,Alpha\n'
+                    '2024-01-06,Chess,Alpha,Beta,Gamma\n'
+                    '2024-01-06,Chess,Alpha\n'
+                    '2024-01-07,Chess,Beta,Alpha,Beta\n')
+
+    report = import_matches(repository, str(path), batch_size=3)
+    assert (report.read, report.imported) == (8, 2)
+    assert [(line, reason) for line, _, reason in report.rejected] == [
+        (3, "invalid date '2024-13-05' (expected YYYY-MM-DD)"),
+        (4, "unknown game 'Go'"),
+        (5, "unknown team 'Gamma'"),
+        (6, "a team cannot play itself"),
+        (7, "winner 'Gamma' did not play in the match"),
+        (8, "expected date, game, team1, team2, winner"),
+    ]
+    assert repository.match_count() == 2
+    assert dict(repository.teams()) == {'Alpha': 1, 'Beta': 1}
+
+    rejects = tmp_path / 'rejects.csv'
+    write_rejects([report], str(rejects))
+    lines = rejects.read_text().splitlines()
+    assert lines[0] == 'file,line,reason,date,game,team1,team2,winner'
+    assert len(lines) == 7
+    repository.close()
+
+
+def test_json_import_rejects_items_that_are_not_matches(tmp_path, repository_factory):
+    repository = populated(repository_factory(tmp_path / 'db'))
+    path = tmp_path / 'results.json'
+    path.write_text(json.dumps([
+        {"date": "2024-01-05", "game": "Chess", "team1": "Alpha", "team2": "Beta", "winner": "Beta"},
+        2.5,
+        {"date": "2024-01-06", "game": "Chess", "team1": "Alpha", "team2": "Beta"},
+    ]))
+
+    report = import_matches(repository, str(path))
+    assert (report.read, report.imported) == (3, 1)
+    assert [line for line, _, _ in report.rejected] == [2, 3]
+    assert repository.last_matches(1)[0]['winner'] == 'Beta'
+    repository.close()
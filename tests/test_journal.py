@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from esr import storage
+from esr.storage import CHECKPOINT_MARKER, JOURNAL_FILE, SEGMENT_DIR, MatchJournal
+
+
+def test_torn_last_line_is_truncated(tmp_path):
+    path = tmp_path / JOURNAL_FILE
+    path.write_bytes(b'1,team,Alpha,0\n2,team,Beta,0\n3,ga')
+
+    journal = MatchJournal(str(path))
+    assert journal.replay() == [(1, 'team', ['Alpha', '0']), (2, 'team', ['Beta', '0'])]
+    assert path.read_bytes() == b'1,team,Alpha,0\n2,team,Beta,0\n'
+    assert journal.last_seq == 2
+
+
+def test_unterminated_quoted_field_is_torn(tmp_path):
+    path = tmp_path / JOURNAL_FILE
+    path.write_bytes(b'1,team,Alpha,0\n2,game,"Half\nwritten')
+
+    journal = MatchJournal(str(path))
+    assert journal.replay() == [(1, 'team', ['Alpha', '0'])]
+    assert path.read_bytes() == b'1,team,Alpha,0\n'
+
+
+def test_quoted_newlines_and_quotes_survive_replay(tmp_path):
+    path = tmp_path / JOURNAL_FILE
+    journal = MatchJournal(str(path))
+    journal.append('game', 'Two\nlines')
+    journal.append('team', 'The "Quoted" Team', '3')
+    journal.append('team', 'Plain', '0')
+    journal.close()
+
+    assert MatchJournal(str(path)).replay() == [
+        (1, 'game', ['Two\nlines']),
+        (2, 'team', ['The "Quoted" Team', '3']),
+        (3, 'team', ['Plain', '0']),
+    ]
+
+
+def test_corruption_before_the_last_line_raises(tmp_path):
+    path = tmp_path / JOURNAL_FILE
+    data = b'1,team,Alpha,0\nnot an entry\n3,team,Beta,0\n'
+    path.write_bytes(data)
+
+    with pytest.raises(ValueError, match='unreadable entry'):
+        MatchJournal(str(path)).replay()
+    assert path.read_bytes() == data
+
+
+def test_names_with_quotes_survive_a_reopen(repository_factory):
+    repository = repository_factory()
+    repository.add_team('The "Quoted" Team')
+    repository.add_game('Chess, "Blitz"')
+    repository.close()
+
+    repository = repository_factory()
+    assert repository.has_team('The "Quoted" Team')
+    assert repository.has_game('Chess, "Blitz"')
+    repository.close()
+
+
+def recorded(opened):
+    repository = opened()
+    repository.add_team('Alpha')
+    repository.add_team('Beta')
+    repository.add_game('Chess')
+    repository.add_match('2024-01-05', 'Chess', 'Alpha', 'Beta', 'Alpha')
+    repository.save()
+    repository.add_match('2024-02-10', 'Chess', 'Alpha', 'Beta', 'Beta')
+    repository.flush()
+    return repository
+
+
+def test_checkpoint_interrupted_after_the_marker_rolls_forward(tmp_path, monkeypatch, repository_factory):
+    repository = recorded(repository_factory)
+
+    def crash(self):
+        raise RuntimeError('crash')
+
+    monkeypatch.setattr(storage.CSVStore, 'commit_files', crash)
+    with pytest.raises(RuntimeError):
+        repository.save()
+    repository.store.close()
+    monkeypatch.undo()
+    assert (tmp_path / CHECKPOINT_MARKER).exists()
+
+    repository = repository_factory()
+    repository.load_history()
+    assert not (tmp_path / CHECKPOINT_MARKER).exists()
+    assert not [name for name in os.listdir(tmp_path / SEGMENT_DIR) if name.endswith('.tmp')]
+    assert repository.match_count() == 2
+    assert dict(repository.teams()) == {'Alpha': 1, 'Beta': 1}
+    # The journal entries the checkpoint covered are gone
+    assert repository.store.journal.entries == 0
+    repository.close()
+
+
+def test_checkpoint_interrupted_before_the_marker_is_discarded(tmp_path, monkeypatch, repository_factory):
+    repository = recorded(repository_factory)
+    write_rows = storage.write_rows
+
+    def crash(path, rows):
+        if path.endswith(CHECKPOINT_MARKER + '.tmp'):
+            raise RuntimeError('crash')
+        write_rows(path, rows)
+
+    monkeypatch.setattr(storage, 'write_rows', crash)
+    with pytest.raises(RuntimeError):
+        repository.save()
+    repository.store.close()
+    monkeypatch.undo()
+    assert (tmp_path / SEGMENT_DIR / '2024-02.csv.tmp').exists()
+
+    repository = repository_factory()
+    repository.load_history()
+    assert not [name for name in os.listdir(tmp_path / SEGMENT_DIR) if name.endswith('.tmp')]
+    assert repository.store.journal.entries == 1
+    assert repository.match_count() == 2
+    assert dict(repository.teams()) == {'Alpha': 1, 'Beta': 1}
+    repository.close()
@@ -0,0 +1,106 @@
+import pytest
+
+from esr.importer import merge_files
+
+ALPHA_WINS = '2024-01-05,Chess,Alpha,Beta,Alpha\n'
+BETA_WINS = '2024-01-05,Chess,Alpha,Beta,Beta\n'
+LATER = '2024-02-01,Go,Gamma,Alpha,Gamma\n'
+
+
+def populated(repository):
+    for team in ('Alpha', 'Beta', 'Gamma'):
+        repository.add_team(team)
+    for game in ('Chess', 'Go'):
+        repository.add_game(game)
+    return repository
+
+
+def written(directory, contents):
+    paths = []
+    for i, text in enumerate(contents):
+        path = directory / f'region-{i}.csv'
+        path.write_text(text)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def merged_into(tmp_path, repository_factory):
+    # A repository with three teams and two games, and a writer of the
+    # files to merge into it
+    repository = populated(repository_factory(tmp_path / 'db'))
+    yield repository, lambda *contents: written(tmp_path, contents)
+    repository.close()
+
+
+def stored(repository):
+    return [tuple(match.values()) for match in repository.matches_between('2000-01-01', '2100-01-01')]
+
+
+def test_the_same_match_in_two_files_is_stored_once(merged_into):
+    repository, files = merged_into
+    report = merge_files(repository, files(ALPHA_WINS + LATER, ALPHA_WINS), workers=1)
+
+    assert (report.read, report.valid, report.imported, report.duplicates) == (3, 3, 2, 1)
+    assert stored(repository) == [('2024-01-05', 'Chess', 'Alpha', 'Beta', 'Alpha'),
+                                  ('2024-02-01', 'Go', 'Gamma', 'Alpha', 'Gamma')]
+
+
+def test_a_file_listing_a_match_twice_adds_it_twice(merged_into):
+    repository, files = merged_into
+    # The other file's copy is one of the two, not a third
+    report = merge_files(repository, files(ALPHA_WINS * 2 + BETA_WINS, ALPHA_WINS), workers=1)
+
+    assert (report.imported, report.duplicates) == (3, 1)
+    assert sorted(stored(repository)) == [('2024-01-05', 'Chess', 'Alpha', 'Beta', 'Alpha')] * 2 + [
+        ('2024-01-05', 'Chess', 'Alpha', 'Beta', 'Beta')]
+    assert dict(repository.teams()) == {'Alpha': 2, 'Beta': 1, 'Gamma': 0}
+
+
+def test_matches_already_stored_are_skipped(merged_into):
+    repository, files = merged_into
+    repository.add_match('2024-01-05', 'Chess', 'Alpha', 'Beta', 'Alpha')
+
+    report = merge_files(repository, files(ALPHA_WINS + LATER), workers=1)
+    assert (report.imported, report.duplicates) == (1, 1)
+
+    # Only the copies beyond those already stored are added
+    report = merge_files(repository, files(ALPHA_WINS * 3 + LATER), workers=1)
+    assert (report.imported, report.duplicates) == (2, 2)
+    assert stored(repository).count(('2024-01-05', 'Chess', 'Alpha', 'Beta', 'Alpha')) == 3
+    assert repository.match_count() == 4
+
+
+def test_rejected_rows_are_reported_per_file(merged_into):
+    repository, files = merged_into
+    paths = files(ALPHA_WINS + '2024-01-05,Chess,Alpha,Delta,Alpha\n', 'not,a,match\n' + LATER)
+    report = merge_files(repository, paths, workers=1)
+
+    assert report.imported == 2
+    assert [[(line, reason) for line, _, reason in report.files[path].rejected] for path in paths] == [
+        [(2, "unknown team 'Delta'")], [(1, "expected date, game, team1, team2, winner")]]
+
+
+def test_worker_processes_merge_like_a_single_process(tmp_path, repository_factory):
+    contents = []
+    for region in range(4):
+        lines = []
+        for day in range(1, 29):
+            winner = ('Alpha', 'Beta', 'Gamma')[(day + region) % 3]
+            loser = 'Beta' if winner != 'Beta' else 'Alpha'
+            lines.append(f'2024-03-{day:02d},Chess,{winner},{loser},{winner}\n')
+            if day % (region + 2) == 0:
+                lines.append(f'2024-03-{day:02d},Go,{loser},{winner},{loser}\n')
+        contents.append(''.join(lines))
+    paths = written(tmp_path, contents)
+
+    results = []
+    for workers in (1, 3):
+        repository = populated(repository_factory(tmp_path / f'db-{workers}'))
+        report = merge_files(repository, paths, workers=workers)
+        results.append(((report.read, report.imported, report.duplicates), stored(repository),
+                        dict(repository.teams())))
+        repository.close()
+
+    assert results[0] == results[1]
+    assert results[0][0][2] > 0
@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from esr.columnar import MatchColumns
+from esr.ratings import ELO_INITIAL, RatingBook, elo_expected
+
+TEAMS = ('Alpha', 'Beta', 'Gamma', 'Delta')
+GAMES = ('Chess', 'Go')
+
+
+def results(count, seed=7):
+    # (date, game, team1, team2, winner) rows, a few with a winner that did
+    # not play (ignored by the ratings)
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        team1, team2 = rng.sample(TEAMS, 2)
+        winner = rng.choice((team1, team2)) if i % 17 else 'Nobody'
+        rows.append((f'2024-01-{i % 28 + 1:02d}', rng.choice(GAMES), team1, team2, winner))
+    return rows
+
+
+def columns_of(rows):
+    columns = MatchColumns()
+    for row in rows:
+        columns.append(*row)
+    return columns
+
+
+def recorded(rows, glicko=False):
+    book = RatingBook(glicko=glicko)
+    for _, game, team1, team2, winner in rows:
+        book.record(game, team1, team2, winner)
+    return book
+
+
+def test_elo_expected_is_symmetric():
+    assert elo_expected(1500, 1500) == 0.5
+    for rating, opponent in ((1500, 1700), (1234.5, 1012.25), (2400, 800)):
+        assert elo_expected(rating, opponent) + elo_expected(opponent, rating) == pytest.approx(1.0)
+    assert elo_expected(1900, 1500) == pytest.approx(10 / 11)
+
+
+def test_a_win_moves_both_ratings_by_the_same_amount():
+    book = recorded([('2024-01-01', 'Chess', 'Alpha', 'Beta', 'Beta')])
+    board = {team: (rating, played) for team, rating, played in book.leaderboard()}
+    assert board['Beta'] == (ELO_INITIAL + 16, 1)
+    assert board['Alpha'] == (ELO_INITIAL - 16, 1)
+    assert [row[0] for row in book.leaderboard('Chess')] == ['Beta', 'Alpha']
+    assert book.leaderboard('Go') == []
+
+
+def test_a_winner_that_did_not_play_is_not_rated():
+    book = recorded([('2024-01-01', 'Chess', 'Alpha', 'Beta', 'Gamma')])
+    assert book.leaderboard() == []
+
+
+# The replay does the same arithmetic in the same order as record(), so
+# the ratings agree exactly
+@pytest.mark.parametrize('glicko', [False, True])
+def test_replay_matches_incremental_updates(glicko):
+    rows = results(300)
+    book = RatingBook(glicko=glicko)
+    book.replay_columns(columns_of(rows))
+    expected = recorded(rows, glicko)
+
+    for game in (None, *GAMES):
+        assert book.leaderboard(game) == expected.leaderboard(game)
+    if glicko:
+        assert book.leaderboard(system='glicko2') == expected.leaderboard(system='glicko2')
+
+    names = RatingBook(glicko=glicko)
+    names.replay([row[1:] for row in rows])
+    assert names.leaderboard() == expected.leaderboard()
+
+
+@pytest.mark.parametrize('glicko', [False, True])
+def test_replay_skips_deleted_rows(glicko):
+    rows = results(200, seed=11)
+    deleted = {row for row, (_, _, team1, team2, _) in enumerate(rows) if 'Delta' in (team1, team2)}
+
+    book = RatingBook(glicko=glicko)
+    book.replay_columns(columns_of(rows), deleted)
+    expected = recorded([row for i, row in enumerate(rows) if i not in deleted], glicko)
+
+    assert 'Delta' not in [row[0] for row in book.leaderboard()]
+    for game in (None, *GAMES):
+        assert book.leaderboard(game) == expected.leaderboard(game)
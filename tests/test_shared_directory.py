@@ -0,0 +1,113 @@
+def shared(opened):
+    # Two repositories on one database, each batching its changes until
+    # an explicit flush as the GUI does
+    setup = opened()
+    for team in ('Alpha', 'Beta', 'Gamma', 'Delta'):
+        setup.add_team(team)
+    for game in ('Chess', 'Go'):
+        setup.add_game(game)
+    setup.add_match('2024-01-05', 'Chess', 'Alpha', 'Beta', 'Alpha')
+    setup.add_match('2024-01-06', 'Go', 'Gamma', 'Delta', 'Delta')
+    setup.save()
+    setup.close()
+
+    first, second = opened(), opened()
+    first.autoflush = second.autoflush = False
+    return first, second
+
+
+def reopened_state(opened):
+    repository = opened()
+    repository.load_history()
+    state = dict(repository.teams()), sorted(repository.games()), repository.match_count()
+    repository.close()
+    return state
+
+
+def test_commuting_changes_are_both_kept(repository_factory):
+    first, second = shared(repository_factory)
+    first.add_match('2024-02-01', 'Chess', 'Alpha', 'Beta', 'Beta')
+    second.add_match('2024-02-02', 'Go', 'Gamma', 'Delta', 'Gamma')
+    first.flush()
+
+    revision = second.revision
+    assert second.refresh()
+    assert second.revision != revision
+    second.flush()
+    first.refresh()
+
+    for repository in (first, second):
+        assert repository.match_count() == 4
+        assert dict(repository.teams()) == {'Alpha': 1, 'Beta': 1, 'Gamma': 1, 'Delta': 1}
+        assert repository.take_conflicts() == []
+        repository.close()
+    assert reopened_state(repository_factory)[2] == 4
+
+
+def test_match_for_a_removed_team_is_a_conflict(repository_factory):
+    first, second = shared(repository_factory)
+    first.remove_team('Alpha')
+    first.flush()
+
+    second.add_match('2024-02-01', 'Chess', 'Alpha', 'Beta', 'Alpha')
+    second.add_match('2024-02-02', 'Go', 'Gamma', 'Delta', 'Gamma')
+    second.flush()
+
+    assert second.take_conflicts() == [('match', ('2024-02-01', 'Chess', 'Alpha', 'Beta', 'Alpha'))]
+    assert not second.has_team('Alpha')
+    assert second.match_count() == 2
+    assert dict(second.teams()) == {'Beta': 0, 'Gamma': 1, 'Delta': 1}
+
+    first.refresh()
+    assert first.match_count() == 2
+    assert dict(first.teams()) == dict(second.teams())
+    first.close()
+    second.close()
+    assert reopened_state(repository_factory) == ({'Beta': 0, 'Gamma': 1, 'Delta': 1}, ['Chess', 'Go'], 2)
+
+
+def test_removals_on_both_sides(repository_factory):
+    first, second = shared(repository_factory)
+    first.remove_game('Chess')
+    second.remove_team('Delta')
+    first.flush()
+    second.flush()
+    first.refresh()
+
+    for repository in (first, second):
+        assert sorted(repository.games()) == ['Go']
+        assert dict(repository.teams()) == {'Alpha': 0, 'Beta': 0, 'Gamma': 0}
+        assert repository.match_count() == 0
+        assert repository.take_conflicts() == []
+        repository.close()
+    assert reopened_state(repository_factory) == ({'Alpha': 0, 'Beta': 0, 'Gamma': 0}, ['Go'], 0)
+
+
+def test_the_same_team_removed_twice(repository_factory):
+    first, second = shared(repository_factory)
+    first.remove_team('Gamma')
+    second.remove_team('Gamma')
+    first.flush()
+    second.flush()
+    first.refresh()
+
+    for repository in (first, second):
+        assert dict(repository.teams()) == {'Alpha': 1, 'Beta': 0, 'Delta': 0}
+        assert repository.match_count() == 1
+        repository.close()
+    assert reopened_state(repository_factory)[0] == {'Alpha': 1, 'Beta': 0, 'Delta': 0}
+
+
+def test_refresh_after_another_checkpoint(repository_factory):
+    first, second = shared(repository_factory)
+    first.add_match('2024-03-01', 'Go', 'Alpha', 'Gamma', 'Gamma')
+    first.save()
+
+    # The journal second had read was replaced by the checkpoint
+    revision = second.revision
+    assert second.refresh()
+    assert second.revision != revision
+    assert second.match_count() == 3
+    assert dict(second.teams())['Gamma'] == 1
+    first.close()
+    second.close()